@@ -0,0 +1,12 @@
+import pytest
+from django.test.utils import override_settings
+
+
+@pytest.fixture(autouse=True, scope='session')
+def metrics_db():
+    """Тесты не пишут метрики в файл settings.METRICS_DB.
+
+    То же для manage.py test делает core.test_runner.TestRunner.
+    """
+    with override_settings(METRICS_DB=None):
+        yield
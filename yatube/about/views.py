@@ -1,9 +1,20 @@
+from django.conf import settings
+from django.utils.decorators import method_decorator
 from django.views.generic.base import TemplateView
 
+from core.holes import cache_page_with_holes
 
+cache_page = method_decorator(
+    cache_page_with_holes(settings.PAGE_CACHE_TIMEOUT, cache_alias='about'),
+    name='dispatch'
+)
+
+
+@cache_page
 class AboutAuthorView(TemplateView):
     template_name = 'about/author.html'
 
 
+@cache_page
 class AboutTechView(TemplateView):
     template_name = 'about/tech.html'
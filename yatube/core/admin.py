@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk',
+                    'name',
+                    'args',
+                    'status',
+                    'attempts',
+                    'run_at',
+                    'last_error',
+                    )
+    list_filter = ('status', 'name')
+    search_fields = ('key',)
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,70 @@
+import atexit
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheProxy:
+    """Как django.core.cache.cache, но для алиаса приложения из CACHES"""
+
+    def __init__(self, alias):
+        self._alias = alias
+
+    def __getattr__(self, name):
+        return getattr(caches[self._alias], name)
+
+    def __contains__(self, key):
+        return key in caches[self._alias]
+
+
+class BufferedCounters:
+    """Счётчики в кэше, которые процесс копит у себя и пишет пачкой.
+
+    incr не обращается к кэшу: накопленное уходит одним incr на счётчик
+    не чаще раза в settings.STATS_FLUSH_INTERVAL секунд, так что запросы
+    не берут блокировку общего кэша ради статистики. get сначала
+    сбрасывает приращения своего процесса.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.key = key
+        self._pending = Counter()
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def incr(self, name, delta=1):
+        with self._lock:
+            self._pending[name] += delta
+            if (time.monotonic() - self._flushed_at
+                    < settings.STATS_FLUSH_INTERVAL):
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._flushed_at = time.monotonic()
+        for name, delta in pending.items():
+            key = self.key.format(name=name)
+            try:
+                self.cache.incr(key, delta)
+            except ValueError:
+                # Другой процесс мог успеть создать ключ
+                if not self.cache.add(key, delta, None):
+                    self.cache.incr(key, delta)
+
+    def get(self, names):
+        self.flush()
+        keys = [self.key.format(name=name) for name in names]
+        values = self.cache.get_many(keys)
+        return {name: values.get(key, 0) for name, key in zip(names, keys)}
+
+    def reset(self, names):
+        with self._lock:
+            self._pending.clear()
+        self.cache.delete_many([self.key.format(name=name) for name in names])
@@ -0,0 +1,67 @@
+"""Постоянные соединения с базой: проверка живости и учёт открытий.
+
+Django 2.2 держит по соединению на алиас в каждом потоке и переиспользует
+его CONN_MAX_AGE секунд, но не проверяет перед запросом, что соединение
+живо (CONN_HEALTH_CHECKS появились только в 4.1), и никак не показывает,
+сколько соединений открывается на запрос. Это делают обработчики ниже и
+core.middleware.ConnectionCountMiddleware.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from core.cache import BufferedCounters, CacheProxy
+
+STATS_KEY = 'db:stats:{name}'
+STATS = ('requests', 'connections')
+
+logger = logging.getLogger(__name__)
+cache = CacheProxy('default')
+stats = BufferedCounters(cache, STATS_KEY)
+
+_local = threading.local()
+
+
+def check_connections(**kwargs):
+    """Закрывает переиспользуемые соединения, которые перестали отвечать"""
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            logger.warning('Соединение %s не отвечает, переоткрываем',
+                           connection.alias)
+            connection.close()
+
+
+def count_connection(sender, connection, **kwargs):
+    if getattr(_local, 'opened', None) is not None:
+        _local.opened += 1
+
+
+def start_counting():
+    _local.opened = 0
+
+
+def stop_counting():
+    opened, _local.opened = _local.opened, None
+    return opened
+
+
+def record_request(opened):
+    stats.incr('requests')
+    if opened:
+        stats.incr('connections', opened)
+    if opened > settings.DB_MAX_CONNECTIONS_PER_REQUEST:
+        logger.warning('Запрос открыл %d соединений с базой', opened)
+
+
+def get_stats():
+    return stats.get(STATS)
+
+
+def reset_stats():
+    stats.reset(STATS)
@@ -0,0 +1,103 @@
+"""Кэш целых страниц с «дырками» под персональные фрагменты.
+
+Страница рендерится один раз для всех: вместо зависящих от пользователя
+кусков (блок входа в шапке, кнопка подписки, форма с CSRF-токеном) тег
+{% hole %} оставляет метку-комментарий. Готовое тело кладётся в кэш, а на
+каждый запрос метки заменяются выводом зарегистрированных рендереров —
+это лёгкий аналог edge side includes.
+"""
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.profiling import record_cache
+
+MARKER = '<!--hole:{name}?{params}-->'
+MARKER_RE = re.compile(r'<!--hole:(?P<name>[\w.]+)\?(?P<params>[^>]*)-->')
+PAGE_KEY = 'page:{digest}'
+
+_renderers = {}
+
+
+def register(name):
+    """Регистрирует рендерер дырки: func(request, **params) -> str"""
+    def decorator(func):
+        _renderers[name] = func
+        return func
+    return decorator
+
+
+def render_hole(request, name, params):
+    return _renderers[name](request, **params)
+
+
+def hole(request, name, params):
+    """Метка дырки при кэшировании страницы, иначе сразу её содержимое"""
+    # Параметры из метки читаются строками, поэтому и здесь передаём строки
+    params = {key: str(value) for key, value in params.items()}
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(MARKER.format(name=name, params=urlencode(params)))
+    return mark_safe(render_hole(request, name, params))
+
+
+def fill_holes(request, content):
+    return MARKER_RE.sub(
+        lambda match: render_hole(
+            request, match['name'], dict(parse_qsl(match['params']))
+        ),
+        content
+    )
+
+
+def cache_page_with_holes(timeout, key_func=None, cache_alias='default'):
+    """Кэширует тело страницы для GET-запросов всех пользователей.
+
+    key_func(request, *args, **kwargs) добавляет к адресу страницы часть
+    ключа, например поколение её данных; None отключает кэш для запроса.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            vary = key_func(request, *args, **kwargs) if key_func else ''
+            if vary is None:
+                return view(request, *args, **kwargs)
+            cache = caches[cache_alias]
+            key = PAGE_KEY.format(digest=hashlib.md5(
+                f'{request.build_absolute_uri()}:{vary}'.encode()
+            ).hexdigest())
+            cached = cache.get(key)
+            record_cache('page', hits=int(cached is not None),
+                         misses=int(cached is None))
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(
+                    fill_holes(request, content), content_type=content_type
+                )
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+            finally:
+                request.punch_holes = False
+            if response.status_code != 200 or response.streaming:
+                return response
+            content = response.content.decode(response.charset)
+            cache.set(key, (content, response['Content-Type']), timeout)
+            response.content = fill_holes(request, content)
+            return response
+        return wrapper
+    return decorator
+
+
+@register('header_user')
+def header_user(request):
+    return render_to_string('includes/header_user.html', request=request)
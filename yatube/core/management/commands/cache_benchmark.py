@@ -0,0 +1,79 @@
+import random
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from os import path
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'sqlite': 'core.cache.backends.SQLiteCache',
+}
+PAYLOAD = 'x' * 2048
+
+
+def run_worker(backend, location, operations, keys, seed):
+    """Чтение с дозаполнением при промахе, как у фрагментов лент"""
+    cache = import_string(BACKENDS[backend])(
+        location, {'OPTIONS': {'MAX_ENTRIES': keys * 2}}
+    )
+    rng = random.Random(seed)
+    hits = 0
+    latencies = []
+    for _ in range(operations):
+        # Популярные ключи запрашиваются чаще, как первые страницы лент
+        key = f'key:{min(int(rng.paretovariate(1.2)), keys)}'
+        started = time.perf_counter()
+        if cache.get(key) is None:
+            cache.set(key, PAYLOAD, 300)
+        else:
+            hits += 1
+        latencies.append(time.perf_counter() - started)
+    return hits, latencies
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает долю попаданий и задержку бэкендов кэша '
+            'при нескольких конкурентных процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=5000)
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--backend', action='append',
+                            choices=sorted(BACKENDS))
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(
+            f'{"backend":<8} {"hit ratio":>9} {"p50, мкс":>9} '
+            f'{"p99, мкс":>9} {"оп/с":>9}'
+        )
+        for backend in options['backend'] or sorted(BACKENDS):
+            with tempfile.TemporaryDirectory() as directory:
+                location = path.join(directory, 'cache.sqlite3')
+                if backend != 'sqlite':
+                    location = directory
+                jobs = [
+                    (backend, location, options['operations'],
+                     options['keys'], seed)
+                    for seed in range(workers)
+                ]
+                started = time.perf_counter()
+                with Pool(workers) as pool:
+                    results = pool.starmap(run_worker, jobs)
+                elapsed = time.perf_counter() - started
+            hits = sum(result[0] for result in results)
+            latencies = sorted(
+                latency for result in results for latency in result[1]
+            )
+            quantiles = statistics.quantiles(latencies, n=100)
+            self.stdout.write(
+                f'{backend:<8} {hits / len(latencies):>9.2%} '
+                f'{quantiles[49] * 1e6:>9.0f} {quantiles[98] * 1e6:>9.0f} '
+                f'{len(latencies) / elapsed:>9.0f}'
+            )
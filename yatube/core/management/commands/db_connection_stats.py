@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.connections import get_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько соединений с базой открывается на запрос'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        requests = stats['requests']
+        per_request = stats['connections'] / requests if requests else 0
+        self.stdout.write(
+            f"requests={stats['requests']} "
+            f"connections={stats['connections']} "
+            f'per_request={per_request:.3f}'
+        )
+        if options['reset']:
+            reset_stats()
@@ -0,0 +1,118 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import (WSGIRequestHandler, WSGIServer,
+                                          get_internal_wsgi_application)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI-сервер с фиксированным числом потоков, как воркер gthread"""
+    request_queue_size = 1024
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+def with_delay(application, delay):
+    """Имитирует медленное хранилище: поток воркера ждёт, не работая"""
+    def wrapper(environ, start_response):
+        time.sleep(delay)
+        return application(environ, start_response)
+    return wrapper
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urlopen(url) as response:
+            response.read()
+    except URLError:
+        return None
+    return time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Нагружает WSGI-приложение при разном числе потоков воркера '
+            'и показывает пропускную способность и задержки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'])
+        parser.add_argument('--threads', type=int, action='append',
+                            help='Потоки воркера; можно указать несколько')
+        parser.add_argument('--concurrency', type=int, default=32,
+                            help='Одновременных клиентов')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--delay', type=float, default=0.05,
+                            help='Задержка ввода-вывода на запрос, с')
+
+    def run(self, application, threads, options):
+        server = PooledWSGIServer(
+            ('127.0.0.1', 0), QuietRequestHandler, threads=threads
+        )
+        server.set_app(application)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        host, port = server.server_address
+        paths = options['paths']
+        urls = [
+            f'http://{host}:{port}{paths[i % len(paths)]}'
+            for i in range(options['requests'])
+        ]
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as clients:
+                results = list(clients.map(fetch, urls))
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+        latencies = sorted(result for result in results if result is not None)
+        return latencies, len(results) - len(latencies), elapsed
+
+    def handle(self, *args, **options):
+        application = get_internal_wsgi_application()
+        if options['delay']:
+            application = with_delay(application, options['delay'])
+        self.stdout.write(
+            f'{"threads":>7} {"запр/с":>8} {"p50, мс":>8} '
+            f'{"p99, мс":>8} {"ошибки":>7}'
+        )
+        for threads in options['threads'] or [1, 4, 16]:
+            latencies, errors, elapsed = self.run(
+                application, threads, options
+            )
+            if len(latencies) > 1:
+                quantiles = statistics.quantiles(latencies, n=100)
+                p50, p99 = quantiles[49] * 1e3, quantiles[98] * 1e3
+            else:
+                p50 = p99 = 0
+            self.stdout.write(
+                f'{threads:>7} {len(latencies) / elapsed:>8.1f} '
+                f'{p50:>8.1f} {p99:>8.1f} {errors:>7}'
+            )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from core import profiling
+
+
+def ms(seconds):
+    return f'{seconds * 1e3:.1f}'
+
+
+class Command(BaseCommand):
+    help = ('Показывает перцентили времени, SQL, шаблонов и попадания '
+            'в кэш по вью из выборочного профилирования')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, default=5,
+                            help='Сколько самых медленных шаблонов показать')
+        parser.add_argument('--reset', action='store_true',
+                            help='Сбросить накопленные замеры')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            profiling.reset()
+            self.stdout.write('Замеры сброшены')
+            return
+        for row in profiling.get_report():
+            time, sql_time = row['time'], row['sql_time']
+            queries, duplicates = row['queries'], row['duplicates']
+            self.stdout.write(
+                f"view={row['view']} samples={row['samples']} "
+                f"p50_ms={ms(time['p50'])} p95_ms={ms(time['p95'])} "
+                f"p99_ms={ms(time['p99'])} "
+                f"queries_p50={queries['p50']} queries_p95={queries['p95']} "
+                f"sql_p95_ms={ms(sql_time['p95'])} "
+                f"duplicates_p95={duplicates['p95']}"
+            )
+            for name, stats in row['cache'].items():
+                self.stdout.write(
+                    f"  cache={name} hits={stats['hits']} "
+                    f"misses={stats['misses']} ratio={stats['ratio']:.2%}"
+                )
+            for name, render in row['templates'][:options['templates']]:
+                self.stdout.write(
+                    f"  template={name} p50_ms={ms(render['p50'])} "
+                    f"p95_ms={ms(render['p95'])}"
+                )
+            if row['top_duplicate']:
+                sql, repeats = row['top_duplicate']
+                self.stdout.write(f'  duplicate x{repeats}: {sql}')
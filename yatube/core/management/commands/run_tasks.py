@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tasks
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи фоновой очереди core.tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.TASKS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        try:
+            while True:
+                close_old_connections()
+                done, failed = tasks.run_batch(options['batch_size'])
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(settings.TASKS_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(
+            f'done={total_done} failed={total_failed} '
+            f'pending={tasks.get_depth()}'
+        )
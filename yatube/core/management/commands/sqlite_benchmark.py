@@ -0,0 +1,140 @@
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from multiprocessing import Pool
+from os import path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.sqlite import apply_pragmas
+
+SCHEMA = '''
+CREATE TABLE post (
+    id INTEGER PRIMARY KEY,
+    author_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    pub_date REAL NOT NULL
+);
+CREATE INDEX post_date_idx ON post (pub_date DESC, id DESC);
+CREATE TABLE comment (
+    id INTEGER PRIMARY KEY,
+    post_id INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX comment_post_idx ON comment (post_id, created);
+'''
+FEED_QUERY = ('SELECT id, author_id, text FROM post '
+              'ORDER BY pub_date DESC, id DESC LIMIT 10 OFFSET ?')
+COMMENTS_QUERY = ('SELECT id, text FROM comment '
+                  'WHERE post_id = ? ORDER BY created')
+
+
+def connect(location, pragmas):
+    # timeout=5 — как у sqlite3 в Django по умолчанию
+    connection = sqlite3.connect(location, timeout=5, isolation_level=None)
+    apply_pragmas(connection.cursor(), pragmas)
+    return connection
+
+
+def run_worker(role, location, pragmas, duration, posts, seed):
+    """Читатель ленты или комментатор; (операций, ошибок, задержки)"""
+    connection = connect(location, pragmas)
+    rng = random.Random(seed)
+    operations = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        post_id = rng.randint(1, posts)
+        started = time.perf_counter()
+        try:
+            if role == 'read':
+                connection.execute(
+                    FEED_QUERY, (rng.randrange(0, posts, 10),)
+                ).fetchall()
+                connection.execute(COMMENTS_QUERY, (post_id,)).fetchall()
+            else:
+                # Как add_comment: запись и счётчик в одной транзакции
+                connection.execute('BEGIN')
+                connection.execute(
+                    'INSERT INTO comment (post_id, text, created) '
+                    'VALUES (?, ?, ?)', (post_id, 'x' * 200, time.time())
+                )
+                connection.execute(
+                    'UPDATE post SET text = text WHERE id = ?', (post_id,)
+                )
+                connection.execute('COMMIT')
+        except sqlite3.OperationalError:
+            errors += 1
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            continue
+        operations += 1
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+    return role, operations, errors, latencies
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность конкурентного чтения и '
+            'записи SQLite без настроек и с settings.SQLITE_PRAGMAS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--posts', type=int, default=10000)
+
+    def prepare(self, location, posts):
+        connection = sqlite3.connect(location)
+        connection.executescript(SCHEMA)
+        now = time.time()
+        connection.executemany(
+            'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)',
+            ((i % 100, 'x' * 500, now - i) for i in range(posts))
+        )
+        connection.commit()
+        connection.close()
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': {},
+            'tuned': settings.SQLITE_PRAGMAS,
+        }
+        self.stdout.write(
+            f'{"profile":<8} {"role":<6} {"оп/с":>8} {"ошибок":>7} '
+            f'{"p50, мс":>8} {"p99, мс":>8}'
+        )
+        for name, pragmas in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                location = path.join(directory, 'bench.sqlite3')
+                self.prepare(location, options['posts'])
+                jobs = [
+                    (role, location, pragmas, options['duration'],
+                     options['posts'], seed)
+                    for seed, role in enumerate(
+                        ['read'] * options['readers']
+                        + ['write'] * options['writers']
+                    )
+                ]
+                with Pool(len(jobs)) as pool:
+                    results = pool.starmap(run_worker, jobs)
+            for role in ('read', 'write'):
+                own = [result for result in results if result[0] == role]
+                if not own:
+                    continue
+                latencies = sorted(
+                    latency for result in own for latency in result[3]
+                ) or [0, 0]
+                quantiles = statistics.quantiles(latencies, n=100)
+                operations = sum(result[1] for result in own)
+                self.stdout.write(
+                    f'{name:<8} {role:<6} '
+                    f'{operations / options["duration"]:>8.0f} '
+                    f'{sum(result[2] for result in own):>7} '
+                    f'{quantiles[49] * 1e3:>8.2f} '
+                    f'{quantiles[98] * 1e3:>8.2f}'
+                )
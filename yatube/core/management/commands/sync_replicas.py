@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в файлы реплик — локальная '
+            'замена репликации')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Копирование реплик поддерживается '
+                               'только для SQLite')
+        if not settings.DATABASE_REPLICAS:
+            self.stdout.write('Реплики не настроены (YATUBE_DB_REPLICAS)')
+            return
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    # Онлайн-копия: основная база остаётся доступной
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}: скопирована')
+        finally:
+            source.close()
@@ -0,0 +1,247 @@
+"""Метрики в формате Prometheus, общие для всех процессов.
+
+Каждый воркер (gunicorn, run_tasks) пишет приращения в один файл SQLite
+settings.METRICS_DB: счётчик или корзина гистограммы — строка, которую
+UPSERT увеличивает атомарно, поэтому процессам не нужно ничего
+согласовывать. Наблюдения за время запроса копятся в памяти и пишутся
+одной транзакцией в конце запроса (core.middleware.MetricsMiddleware).
+Если файл занят дольше settings.METRICS_TIMEOUT, пачка теряется: метрики
+не должны ломать запрос.
+Гистограммы хранят некумулятивные корзины; накопленные значения le
+считает render при отдаче /metrics. Gauge вычисляются при отдаче.
+Без settings.METRICS_DB наблюдения отбрасываются.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+INF = math.inf
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'name TEXT, labels TEXT, suffix TEXT, le REAL, value REAL, '
+    'PRIMARY KEY (name, labels, suffix, le))'
+)
+UPSERT = (
+    'INSERT INTO metrics (name, labels, suffix, le, value) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (name, labels, suffix, le) '
+    'DO UPDATE SET value = value + excluded.value'
+)
+
+_registry = []
+_local = threading.local()
+
+
+def get_connection():
+    """Соединение потока с файлом метрик; после fork открывается заново"""
+    owner = (os.getpid(), settings.METRICS_DB, settings.METRICS_TIMEOUT)
+    if getattr(_local, 'owner', None) != owner:
+        os.makedirs(os.path.dirname(settings.METRICS_DB), exist_ok=True)
+        connection = sqlite3.connect(
+            settings.METRICS_DB, timeout=settings.METRICS_TIMEOUT
+        )
+        connection.execute('PRAGMA journal_mode=wal')
+        connection.execute('PRAGMA synchronous=normal')
+        connection.execute(SCHEMA)
+        _local.connection, _local.owner = connection, owner
+    return _local.connection
+
+
+def write(rows):
+    if not settings.METRICS_DB:
+        return
+    try:
+        with get_connection() as connection:
+            connection.executemany(UPSERT, rows)
+    except sqlite3.Error:
+        logger.warning('Метрики не записаны: %d строк', len(rows),
+                       exc_info=True)
+
+
+def add(rows):
+    buffer = getattr(_local, 'buffer', None)
+    if buffer is None:
+        write(rows)
+    else:
+        buffer.extend(rows)
+
+
+def start_batch():
+    """Дальше наблюдения потока копятся до flush"""
+    _local.buffer = []
+
+
+def flush():
+    rows, _local.buffer = getattr(_local, 'buffer', None), None
+    if rows:
+        write(rows)
+
+
+def format_labels(labels):
+    return ','.join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n')
+        )
+        for key, value in sorted(labels.items())
+    )
+
+
+def sample(name, labels, value):
+    if labels:
+        return f'{name}{{{labels}}} {value:g}'
+    return f'{name} {value:g}'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        _registry.append(self)
+
+    def header(self):
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount:
+            add([(self.name, format_labels(labels), '_total', 0, amount)])
+
+    def render(self, rows):
+        return [
+            sample(f'{self.name}_total', labels, value)
+            for (labels, suffix, le), value in sorted(rows.items())
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets) + (INF,)
+
+    def observe(self, value, **labels):
+        labels = format_labels(labels)
+        le = next(bucket for bucket in self.buckets if value <= bucket)
+        add([
+            (self.name, labels, '_bucket', le, 1),
+            (self.name, labels, '_sum', 0, value),
+        ])
+
+    def render(self, rows):
+        by_labels = defaultdict(dict)
+        for (labels, suffix, le), value in rows.items():
+            by_labels[labels][suffix, le] = value
+        lines = []
+        for labels, values in sorted(by_labels.items()):
+            prefix = f'{labels},' if labels else ''
+            total = 0
+            for bucket in self.buckets:
+                total += values.get(('_bucket', bucket), 0)
+                le = '+Inf' if bucket == INF else f'{bucket:g}'
+                lines.append(
+                    f'{self.name}_bucket{{{prefix}le="{le}"}} {total:g}'
+                )
+            lines.append(
+                sample(f'{self.name}_sum', labels, values.get(('_sum', 0), 0))
+            )
+            lines.append(sample(f'{self.name}_count', labels, total))
+        return lines
+
+
+class Gauge(Metric):
+    """Значение, которое считает функция в момент отдачи метрик"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, collect):
+        super().__init__(name, documentation)
+        self.collect = collect
+
+    def render(self, rows):
+        return [
+            sample(self.name, format_labels(labels), value)
+            for labels, value in self.collect()
+        ]
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus"""
+    stored = defaultdict(dict)
+    rows = []
+    if settings.METRICS_DB:
+        try:
+            rows = get_connection().execute(
+                'SELECT name, labels, suffix, le, value FROM metrics'
+            ).fetchall()
+        except sqlite3.Error:
+            # Отдаём хотя бы gauge, которые считаются по базе приложения
+            logger.warning('Метрики не прочитаны', exc_info=True)
+    for name, labels, suffix, le, value in rows:
+        stored[name][labels, suffix, le] = value
+    lines = []
+    for metric in _registry:
+        lines += metric.header() + metric.render(stored[metric.name])
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    if not settings.METRICS_DB:
+        return
+    with get_connection() as connection:
+        connection.execute('DELETE FROM metrics')
+
+
+def get_queue_depth():
+    counts = dict(
+        Task.objects.order_by().values_list('status').annotate(Count('id'))
+    )
+    return [
+        ({'status': status}, counts.get(status, 0))
+        for status, _ in Task.STATUSES
+    ]
+
+
+REQUEST_DURATION = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа вью, секунды',
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_QUERIES = Histogram(
+    'yatube_request_db_queries',
+    'Запросов к базе за запрос',
+    (0, 1, 2, 5, 10, 20, 50, 100)
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests',
+    'Обращения к кэшам страниц и фрагментов по результату'
+)
+THUMBNAIL_DURATION = Histogram(
+    'yatube_thumbnail_seconds',
+    'Время подготовки всех вариантов одной картинки, секунды',
+    (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+QUEUE_DEPTH = Gauge(
+    'yatube_task_queue_depth',
+    'Задачи очереди core.tasks по статусам',
+    get_queue_depth
+)
@@ -0,0 +1,133 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections as databases
+
+from core import connections, metrics, profiling
+from core.routers import routing
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def wrap_queries(wrapper):
+    """execute_wrapper сразу на всех соединениях потока"""
+    stack = ExitStack()
+    for connection in databases.all():
+        stack.enter_context(connection.execute_wrapper(wrapper))
+    return stack
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    """Читает с реплик, но не сразу после записи.
+
+    После запроса, записавшего что-то в базу, клиент получает короткоживущую
+    куку, и пока она жива, его запросы читают из основной базы — так
+    пользователь видит свой пост или комментарий несмотря на отставание
+    реплик. Кэшируемые страницы читают из основной базы всегда
+    (posts.conditional).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        use_replicas = (
+            request.method in SAFE_METHODS
+            and settings.REPLICA_PIN_COOKIE not in request.COOKIES
+        )
+        with routing(use_replicas) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+
+class ConnectionCountMiddleware:
+    """Считает соединения с базой, открытые за запрос.
+
+    Число уходит в заголовок X-DB-Connections и в общие счётчики
+    (manage.py db_connection_stats): при работающих постоянных соединениях
+    оно почти всегда равно нулю.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        connections.start_counting()
+        try:
+            response = self.get_response(request)
+        finally:
+            opened = connections.stop_counting()
+        connections.record_request(opened)
+        response['X-DB-Connections'] = opened
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует выборку запросов, см. core.profiling"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        profile = profiling.start()
+        started = time.perf_counter()
+        try:
+            with wrap_queries(profile.execute):
+                response = self.get_response(request)
+        finally:
+            profiling.stop()
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            profiling.record(
+                match.view_name, profile.as_sample(
+                    time.perf_counter() - started
+                )
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Время ответа и число запросов к базе по вью для /metrics.
+
+    Все наблюдения запроса пишутся в общее хранилище core.metrics одной
+    транзакцией.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics.start_batch()
+        queries = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with wrap_queries(queries):
+                response = self.get_response(request)
+            match = getattr(request, 'resolver_match', None)
+            view = match.view_name if match is not None else 'unresolved'
+            metrics.REQUEST_DURATION.observe(
+                time.perf_counter() - started, view=view
+            )
+            metrics.REQUEST_QUERIES.observe(queries.count, view=view)
+        finally:
+            metrics.flush()
+        return response
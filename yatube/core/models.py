@@ -0,0 +1,54 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Фоновая задача очереди core.tasks"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=100)
+    # Аргументы обработчика списком JSON
+    args = models.TextField('Аргументы', default='[]')
+    key = models.CharField(
+        'Ключ идемпотентности',
+        max_length=255,
+        blank=True,
+        null=True
+    )
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveIntegerField('Попытки', default=0)
+    run_at = models.DateTimeField('Выполнить после', default=timezone.now)
+    locked_by = models.CharField(max_length=32, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # Пока задача ждёт, такую же можно не ставить
+            models.UniqueConstraint(
+                name='unique_pending_task_key',
+                fields=['key'],
+                condition=Q(status='pending')
+            ),
+        ]
+        indexes = [
+            models.Index(name='task_status_run_at_idx',
+                         fields=['status', 'run_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.name}{self.args}'
@@ -0,0 +1,196 @@
+"""Выборочное профилирование запросов по вью.
+
+core.middleware.ProfilingMiddleware профилирует долю запросов
+settings.PROFILING_SAMPLE_RATE: считает запросы к базе и их время через
+execute_wrapper, повторы одного и того же SQL (признак N+1), время
+рендеринга каждого шаблона, включая вложенные include, и попадания в кэши,
+о которых сообщают record_cache (их же получают метрики core.metrics).
+Последние settings.PROFILING_WINDOW замеров каждой вью хранятся в кэше
+default, перцентили по ним считает get_report (manage.py profile_report
+и страница /admin/profiling/). Непрофилируемый запрос платит только за
+проверку thread-local.
+"""
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.template.base import Template
+
+from core import metrics
+from core.cache import CacheProxy
+
+SAMPLES_KEY = 'profile:{view}'
+VIEWS_KEY = 'profile:views'
+PERCENTILES = (50, 95, 99)
+
+cache = CacheProxy('default')
+
+_local = threading.local()
+
+
+class Profile:
+    """Замеры одного запроса"""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.sql_time = 0.0
+        self.templates = {}
+        self.cache = {}
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            # Параметры не входят в SQL, поэтому N+1 даёт один и тот же текст
+            self.queries[sql] += 1
+
+    def as_sample(self, elapsed):
+        sql, repeats = (self.queries.most_common(1) or [('', 0)])[0]
+        return {
+            'time': elapsed,
+            'queries': sum(self.queries.values()),
+            'sql_time': self.sql_time,
+            'duplicates': sum(count - 1 for count in self.queries.values()),
+            'top_duplicate': [sql[:500], repeats] if repeats > 1 else None,
+            'templates': self.templates,
+            'cache': self.cache,
+        }
+
+
+def get_profile():
+    return getattr(_local, 'profile', None)
+
+
+def start():
+    _local.profile = Profile()
+    return _local.profile
+
+
+def stop():
+    _local.profile = None
+
+
+def record_cache(name, hits=0, misses=0):
+    """Попадания и промахи кэша name: в метрики и профиль запроса"""
+    metrics.CACHE_REQUESTS.inc(hits, cache=name, result='hit')
+    metrics.CACHE_REQUESTS.inc(misses, cache=name, result='miss')
+    profile = get_profile()
+    if profile is not None:
+        counts = profile.cache.setdefault(name, [0, 0])
+        counts[0] += hits
+        counts[1] += misses
+
+
+def instrument_templates():
+    """Замеряет Template.render в профилируемых запросах"""
+    render = Template.render
+    if getattr(render, 'profiled', False):
+        return
+
+    @wraps(render)
+    def profiled_render(self, context):
+        profile = get_profile()
+        if profile is None:
+            return render(self, context)
+        started = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            name = self.origin.template_name or self.origin.name
+            profile.templates[name] = (
+                profile.templates.get(name, 0)
+                + time.perf_counter() - started
+            )
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def record(view, sample):
+    """Добавляет замер в скользящее окно вью"""
+    key = SAMPLES_KEY.format(view=view)
+    # Гонка между процессами теряет отдельные замеры, для выборки это
+    # допустимо
+    samples = cache.get(key, [])
+    samples.append(sample)
+    cache.set(key, samples[-settings.PROFILING_WINDOW:], None)
+    views = cache.get(VIEWS_KEY, set())
+    if view not in views:
+        views.add(view)
+        cache.set(VIEWS_KEY, views, None)
+
+
+def percentiles(values):
+    """Перцентили PERCENTILES по ближайшему рангу"""
+    values = sorted(values)
+    if not values:
+        return {f'p{q}': 0 for q in PERCENTILES}
+    return {
+        f'p{q}': values[min(len(values) - 1, len(values) * q // 100)]
+        for q in PERCENTILES
+    }
+
+
+def summarize(view, samples):
+    templates = {}
+    cache_counts = {}
+    duplicates = Counter()
+    for sample in samples:
+        for name, seconds in sample['templates'].items():
+            templates.setdefault(name, []).append(seconds)
+        for name, (hits, misses) in sample['cache'].items():
+            counts = cache_counts.setdefault(name, [0, 0])
+            counts[0] += hits
+            counts[1] += misses
+        if sample['top_duplicate']:
+            sql, repeats = sample['top_duplicate']
+            duplicates[sql] += repeats
+    return {
+        'view': view,
+        'samples': len(samples),
+        'time': percentiles(sample['time'] for sample in samples),
+        'queries': percentiles(sample['queries'] for sample in samples),
+        'sql_time': percentiles(sample['sql_time'] for sample in samples),
+        'duplicates': percentiles(
+            sample['duplicates'] for sample in samples
+        ),
+        'top_duplicate': (duplicates.most_common(1) or [None])[0],
+        'templates': sorted(
+            (
+                (name, percentiles(values))
+                for name, values in templates.items()
+            ),
+            key=lambda item: item[1]['p95'],
+            reverse=True
+        ),
+        'cache': {
+            name: {
+                'hits': hits,
+                'misses': misses,
+                'ratio': hits / (hits + misses) if hits + misses else 0,
+            }
+            for name, (hits, misses) in sorted(cache_counts.items())
+        },
+    }
+
+
+def get_report():
+    """Сводка по вью, самые медленные по p95 сверху"""
+    views = cache.get(VIEWS_KEY, set())
+    samples = cache.get_many([SAMPLES_KEY.format(view=view) for view in views])
+    report = [
+        summarize(view, samples[SAMPLES_KEY.format(view=view)])
+        for view in views if samples.get(SAMPLES_KEY.format(view=view))
+    ]
+    return sorted(report, key=lambda row: row['time']['p95'], reverse=True)
+
+
+def reset():
+    views = cache.get(VIEWS_KEY, set())
+    cache.delete_many(
+        [SAMPLES_KEY.format(view=view) for view in views] + [VIEWS_KEY]
+    )
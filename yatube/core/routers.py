@@ -0,0 +1,80 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики перечислены в settings.DATABASE_REPLICAS. Чтение уходит на них
+только внутри routing(use_replicas=True) — его включает
+core.middleware.ReplicaMiddleware для безопасных запросов, — поэтому
+команды, фоновые потоки и тесты по умолчанию читают из основной базы.
+Внутри primary_reads запрос снова читает из основной базы — так работают
+кэшируемые страницы, ключи которых строятся по уже записанным изменениям.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+_local = threading.local()
+
+
+class RoutingState:
+    def __init__(self, use_replicas):
+        self.use_replicas = use_replicas
+        self.wrote = False
+
+
+@contextmanager
+def routing(use_replicas):
+    """Маршрутизация чтения для текущего потока; отмечает запись в базу"""
+    previous = getattr(_local, 'state', None)
+    _local.state = state = RoutingState(use_replicas)
+    try:
+        yield state
+    finally:
+        _local.state = previous
+
+
+@contextmanager
+def primary_reads():
+    """Чтение из основной базы до конца блока; запись по-прежнему учитывается.
+
+    Работает и как декоратор.
+    """
+    state = getattr(_local, 'state', None)
+    if state is None or not state.use_replicas:
+        yield
+        return
+    state.use_replicas = False
+    try:
+        yield
+    finally:
+        state.use_replicas = True
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = getattr(_local, 'state', None)
+        if state is None or not state.use_replicas:
+            return PRIMARY
+        if not settings.DATABASE_REPLICAS:
+            return PRIMARY
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = getattr(_local, 'state', None)
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему копированием основной базы
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import connections, sqlite
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        sqlite.apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+        sqlite.optimize_if_due(cursor, settings.SQLITE_OPTIMIZE_INTERVAL)
+
+
+connection_created.connect(connections.count_connection)
+request_started.connect(connections.check_connections)
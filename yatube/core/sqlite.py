@@ -0,0 +1,30 @@
+"""Профиль PRAGMA для SQLite в продакшене.
+
+WAL разводит читателей и писателя, busy_timeout заставляет ждать
+блокировку вместо мгновенного «database is locked», а mmap, cache_size и
+temp_store уменьшают число системных вызовов. Настройки применяются к
+каждому новому соединению (core.signals), PRAGMA optimize выполняется не
+чаще раза в settings.SQLITE_OPTIMIZE_INTERVAL секунд на процесс.
+"""
+import threading
+import time
+
+_lock = threading.Lock()
+_optimized_at = None
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def optimize_if_due(cursor, interval):
+    """PRAGMA optimize, если с прошлого запуска прошло interval секунд"""
+    global _optimized_at
+    now = time.monotonic()
+    with _lock:
+        if _optimized_at is not None and now - _optimized_at < interval:
+            return False
+        _optimized_at = now
+    cursor.execute('PRAGMA optimize')
+    return True
@@ -0,0 +1,153 @@
+"""Очередь фоновых задач в базе.
+
+Побочные эффекты записи (индексация, раскладка по лентам, картинки)
+ставятся в очередь строкой Task в той же транзакции, что и сама запись
+(transactional outbox): задача появляется тогда и только тогда, когда
+зафиксированы данные, а ответ не ждёт её выполнения. Воркер
+manage.py run_tasks забирает готовые задачи пачками, задачи с одним именем
+и обработчиком batch=True выполняет одним вызовом, а упавшие повторяет
+с экспоненциальной задержкой. Ключ идемпотентности не даёт поставить
+вторую такую же задачу, пока первая ждёт.
+
+С settings.TASKS_EAGER задачи выполняются сразу при постановке, как
+в Celery с task_always_eager: так работают тесты и локальная разработка.
+"""
+import json
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_handlers = {}
+
+
+def register(name, batch=False):
+    """Регистрирует обработчик задачи.
+
+    Обработчик вызывается с аргументами задачи, а с batch=True — один раз
+    со списком аргументов всех задач пачки.
+    """
+    def decorator(func):
+        _handlers[name] = (func, batch)
+        return func
+    return decorator
+
+
+def call(name, args_list):
+    func, batch = _handlers[name]
+    if batch:
+        func(args_list)
+    else:
+        for args in args_list:
+            func(*args)
+
+
+def enqueue(name, *args, key=None):
+    """Ставит задачу в очередь текущей транзакции"""
+    if name not in _handlers:
+        raise KeyError(f'Неизвестная задача {name}')
+    if settings.TASKS_EAGER:
+        try:
+            # Точка сохранения: упавший обработчик не должен ломать
+            # транзакцию вью, которое поставило задачу
+            with transaction.atomic():
+                call(name, [list(args)])
+        except Exception:
+            logger.exception('Задача %s%s не выполнена', name, list(args))
+        return
+    # INSERT OR IGNORE: ждущая задача с тем же ключом уже есть
+    Task.objects.bulk_create(
+        [Task(name=name, args=json.dumps(args), key=key)],
+        ignore_conflicts=key is not None
+    )
+
+
+def release_stale():
+    """Возвращает в очередь задачи воркеров, которые не закончили их вовремя"""
+    deadline = timezone.now() - timedelta(seconds=settings.TASKS_LOCK_TIMEOUT)
+    stale = Task.objects.filter(status=Task.RUNNING, started_at__lt=deadline)
+    with transaction.atomic():
+        # Если такая же задача уже ждёт, зависшая не нужна, а вернуть её
+        # в очередь не дал бы уникальный индекс ждущих ключей
+        stale.filter(key__in=Task.objects.filter(
+            status=Task.PENDING, key__isnull=False
+        ).values('key')).delete()
+        return stale.update(status=Task.PENDING, locked_by='')
+
+
+def claim(limit):
+    """Забирает до limit готовых задач; параллельные воркеры их не получат"""
+    now = timezone.now()
+    ids = list(
+        Task.objects.filter(status=Task.PENDING, run_at__lte=now)
+        .order_by('run_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    Task.objects.filter(pk__in=ids, status=Task.PENDING).update(
+        status=Task.RUNNING,
+        locked_by=token,
+        started_at=now,
+        attempts=F('attempts') + 1
+    )
+    return list(Task.objects.filter(locked_by=token).order_by('id'))
+
+
+def fail(tasks, error):
+    """Откладывает задачи на повтор, а исчерпавшие попытки помечает FAILED"""
+    now = timezone.now()
+    for task in tasks:
+        task.last_error = error
+        task.locked_by = ''
+        if task.attempts >= settings.TASKS_MAX_ATTEMPTS:
+            task.status = Task.FAILED
+        else:
+            task.status = Task.PENDING
+            task.run_at = now + timedelta(
+                seconds=settings.TASKS_RETRY_DELAY * 2 ** (task.attempts - 1)
+            )
+        # Если такая же задача уже ждёт, повтор не нужен
+        if task.status == Task.PENDING and task.key and Task.objects.filter(
+            key=task.key, status=Task.PENDING
+        ).exists():
+            task.delete()
+            continue
+        task.save(update_fields=['status', 'run_at', 'last_error',
+                                 'locked_by'])
+
+
+def run_batch(limit=None):
+    """Выполняет одну пачку задач; возвращает (выполнено, упало)"""
+    release_stale()
+    tasks = claim(limit or settings.TASKS_BATCH_SIZE)
+    by_name = {}
+    for task in tasks:
+        by_name.setdefault(task.name, []).append(task)
+    done = failed = 0
+    for name, group in by_name.items():
+        try:
+            with transaction.atomic():
+                call(name, [json.loads(task.args) for task in group])
+        except Exception as error:
+            logger.exception('Задача %s не выполнена', name)
+            fail(group, f'{type(error).__name__}: {error}')
+            failed += len(group)
+        else:
+            Task.objects.filter(pk__in=[task.pk for task in group]).delete()
+            done += len(group)
+    return done, failed
+
+
+def get_depth():
+    """Число задач, ждущих выполнения"""
+    return Task.objects.filter(status=Task.PENDING).count()
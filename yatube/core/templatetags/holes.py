@@ -0,0 +1,14 @@
+from django import template
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """Персональный фрагмент страницы, см. core.holes.
+
+    {% hole 'follow_button' username=author.username %}
+    """
+    return holes.hole(context.get('request'), name, params)
@@ -0,0 +1,22 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты не пишут метрики в файл settings.METRICS_DB.
+
+    Тесты самих метрик (core.tests.test_metrics) задают временный файл.
+    Счётчики статистики пишутся в кэш сразу, чтобы очистка кэша в тесте
+    не оставляла приращений предыдущих тестов.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(
+            METRICS_DB=None, STATS_FLUSH_INTERVAL=0
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+import time
+from multiprocessing import Pool
+from os import path
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import BufferedCounters
+from core.cache.backends import SQLiteCache
+
+
+def incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {'KEY_PREFIX': 'posts'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_add_and_expiry(self):
+        self.assertTrue(self.cache.add('key', 1, 0.1))
+        self.assertFalse(self.cache.add('key', 2))
+        time.sleep(0.2)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 3))
+        self.assertEqual(self.cache.get('key'), 3)
+
+    def test_incr(self):
+        with self.assertRaises(ValueError):
+            self.cache.incr('counter')
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+
+    def test_clear_keeps_other_prefixes(self):
+        other = SQLiteCache(self.location, {'KEY_PREFIX': 'about'})
+        self.cache.set('key', 1)
+        other.set('key', 2)
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(other.get('key'), 2)
+
+    def test_cull(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2},
+        })
+        cache.set_many({f'key{i}': i for i in range(20)})
+        cache._cull()
+        self.assertEqual(len(cache.get_many([f'key{i}' for i in range(20)])),
+                         10)
+
+    def test_incr_is_atomic_across_processes(self):
+        cache = SQLiteCache(self.location, {})
+        cache.set('counter', 0)
+        with Pool(4) as pool:
+            pool.starmap(incr_many, [(self.location, 50)] * 4)
+        self.assertEqual(cache.get('counter'), 200)
+
+
+@override_settings(STATS_FLUSH_INTERVAL=60)
+class BufferedCountersTest(SimpleTestCase):
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+        self.counters = BufferedCounters(self.cache, 'test:{name}')
+
+    def test_increments_are_written_in_batches(self):
+        for _ in range(3):
+            self.counters.incr('hits')
+        self.counters.incr('misses', 2)
+        self.assertIsNone(self.cache.get('test:hits'))
+        self.assertEqual(self.counters.get(['hits', 'misses']),
+                         {'hits': 3, 'misses': 2})
+        self.assertEqual(self.cache.get('test:hits'), 3)
+
+    @override_settings(STATS_FLUSH_INTERVAL=0)
+    def test_interval_elapsed_flushes(self):
+        self.counters.incr('hits')
+        self.assertEqual(self.cache.get('test:hits'), 1)
+
+    def test_reset_drops_pending(self):
+        self.counters.incr('hits')
+        self.counters.reset(['hits'])
+        self.assertEqual(self.counters.get(['hits']), {'hits': 0})
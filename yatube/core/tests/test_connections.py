@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+
+from core import connections
+from core.middleware import ConnectionCountMiddleware
+
+# Не SQLite, чтобы обработчик PRAGMA не трогал соединение теста
+NEW_CONNECTION = mock.Mock(vendor='postgresql')
+
+
+class ConnectionCountTest(TestCase):
+    def setUp(self):
+        connections.reset_stats()
+
+    def test_reused_connection_is_not_counted(self):
+        response = Client().get('/')
+        self.assertEqual(response['X-DB-Connections'], '0')
+        self.assertEqual(connections.get_stats(),
+                         {'requests': 1, 'connections': 0})
+
+    def test_opened_connections_are_counted(self):
+        def view(request):
+            connection_created.send(sender=None, connection=NEW_CONNECTION)
+            return HttpResponse()
+        middleware = ConnectionCountMiddleware(view)
+        with self.assertLogs('core.connections', 'WARNING'):
+            with override_settings(DB_MAX_CONNECTIONS_PER_REQUEST=0):
+                response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response['X-DB-Connections'], '1')
+        self.assertEqual(connections.get_stats(),
+                         {'requests': 1, 'connections': 1})
+
+    def test_connections_are_not_counted_outside_requests(self):
+        connection_created.send(sender=None, connection=NEW_CONNECTION)
+        self.assertEqual(connections.get_stats()['connections'], 0)
+
+
+class HealthCheckTest(TestCase):
+    def fake_connection(self, usable):
+        return mock.Mock(connection=object(), in_atomic_block=False,
+                         alias='default', **{'is_usable.return_value': usable})
+
+    def test_broken_connections_are_closed(self):
+        broken = self.fake_connection(usable=False)
+        alive = self.fake_connection(usable=True)
+        with mock.patch.object(connections.connections, 'all',
+                               return_value=[broken, alive]):
+            with self.assertLogs('core.connections', 'WARNING'):
+                connections.check_connections()
+        broken.close.assert_called_once_with()
+        alive.close.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_can_be_disabled(self):
+        broken = self.fake_connection(usable=False)
+        with mock.patch.object(connections.connections, 'all',
+                               return_value=[broken]):
+            connections.check_connections()
+        broken.close.assert_not_called()
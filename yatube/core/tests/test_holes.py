@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from core import holes
+
+User = get_user_model()
+
+
+class HolesTest(TestCase):
+    def setUp(self):
+        caches['about'].clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(
+            User.objects.create_user(username='Yaroslav')
+        )
+
+    def test_about_pages_are_cached_with_personal_header(self):
+        for name in ('about:author', 'about:tech'):
+            with self.subTest(name=name):
+                address = reverse(name)
+                response = self.guest_client.get(address)
+                self.assertContains(response, 'Войти')
+                response = self.authorized_client.get(address)
+                self.assertEqual(len(response.templates), 1)
+                self.assertContains(response, 'Пользователь: Yaroslav')
+
+    def test_escaped_markers_are_not_filled(self):
+        request = RequestFactory().get('/')
+        content = '&lt;!--hole:header_user?--&gt;'
+        self.assertEqual(holes.fill_holes(request, content), content)
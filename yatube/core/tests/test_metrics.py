@@ -0,0 +1,117 @@
+import shutil
+import sqlite3
+import tempfile
+from multiprocessing import Pool
+from os import path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics, tasks
+from posts.cache import cache
+from posts.models import Post
+
+User = get_user_model()
+TEMP_DIR = tempfile.mkdtemp()
+
+
+def count_hits(times):
+    for _ in range(times):
+        metrics.CACHE_REQUESTS.inc(cache='shared', result='hit')
+
+
+@override_settings(METRICS_DB=path.join(TEMP_DIR, 'metrics.sqlite3'),
+                   TASKS_EAGER=False)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = Client()
+
+    def test_views_and_caches_are_measured(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4')
+        lines = response.content.decode().splitlines()
+        expected = [
+            'yatube_request_duration_seconds_count{view="posts:index"} 2',
+            'yatube_cache_requests_total{cache="page",result="hit"} 1',
+            'yatube_cache_requests_total{cache="page",result="miss"} 1',
+            'yatube_cache_requests_total{cache="feed:index",result="miss"} 1',
+        ]
+        for line in expected:
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+        self.assertIn('# TYPE yatube_request_db_queries histogram', lines)
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.REQUEST_QUERIES.observe(3, view='test')
+        metrics.REQUEST_QUERIES.observe(30, view='test')
+        lines = metrics.render().splitlines()
+        name = 'yatube_request_db_queries'
+        for line in [
+            f'{name}_bucket{{view="test",le="2"}} 0',
+            f'{name}_bucket{{view="test",le="5"}} 1',
+            f'{name}_bucket{{view="test",le="+Inf"}} 2',
+            f'{name}_sum{{view="test"}} 33',
+            f'{name}_count{{view="test"}} 2',
+        ]:
+            with self.subTest(line=line):
+                self.assertIn(line, lines)
+
+    def test_processes_share_store(self):
+        with Pool(2) as pool:
+            pool.map(count_hits, [100, 100])
+        self.assertIn(
+            'yatube_cache_requests_total{cache="shared",result="hit"} 200',
+            metrics.render().splitlines()
+        )
+
+    @override_settings(METRICS_TIMEOUT=0)
+    def test_locked_store_does_not_fail_requests(self):
+        metrics.render()
+        lock = sqlite3.connect(settings.METRICS_DB)
+        try:
+            lock.execute('BEGIN EXCLUSIVE')
+            with mock.patch('core.metrics.logger') as logger:
+                response = self.client.get(reverse('about:author'))
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(reverse('metrics'))
+                self.assertContains(response, 'yatube_task_queue_depth')
+            logger.warning.assert_called()
+        finally:
+            lock.rollback()
+            lock.close()
+
+    @override_settings(METRICS_DB=None)
+    def test_unset_store_drops_observations(self):
+        metrics.REQUEST_QUERIES.observe(3, view='test')
+        self.assertNotIn('view="test"', metrics.render())
+
+    def test_queue_depth(self):
+        Post.objects.create(text='Ещё текст', author=self.user)
+        tasks.enqueue('posts.index', 0)
+        lines = metrics.render().splitlines()
+        self.assertIn(
+            f'yatube_task_queue_depth{{status="pending"}} '
+            f'{tasks.get_depth()}',
+            lines
+        )
+        self.assertIn('yatube_task_queue_depth{status="failed"} 0', lines)
@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import profiling
+from posts.cache import cache
+from posts.models import Post
+
+User = get_user_model()
+
+
+def execute(sql, params, many, context):
+    return None
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1)
+class ProfilingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        Post.objects.create(text='Тестовый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+        self.client = Client()
+
+    def get_row(self, view):
+        return next(
+            row for row in profiling.get_report() if row['view'] == view
+        )
+
+    def test_request_is_profiled(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        row = self.get_row('posts:index')
+        self.assertEqual(row['samples'], 2)
+        self.assertGreater(row['queries']['p95'], 0)
+        self.assertGreater(row['time']['p50'], 0)
+        self.assertIn('includes/post_list.html',
+                      [name for name, render in row['templates']])
+        self.assertEqual(row['cache']['page']['hits'], 1)
+        self.assertEqual(row['cache']['page']['misses'], 1)
+
+    def test_duplicate_queries_are_reported(self):
+        profile = profiling.Profile()
+        for _ in range(3):
+            profile.execute(execute, 'SELECT 1 WHERE id = %s', [1], False,
+                            {})
+        sample = profile.as_sample(0.1)
+        self.assertEqual(sample['queries'], 3)
+        self.assertEqual(sample['duplicates'], 2)
+        self.assertEqual(sample['top_duplicate'],
+                         ['SELECT 1 WHERE id = %s', 3])
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.get_report(), [])
+
+    @override_settings(PROFILING_WINDOW=2)
+    def test_window_keeps_latest_samples(self):
+        for _ in range(3):
+            self.client.get(reverse('about:author'))
+        self.assertEqual(self.get_row('about:author')['samples'], 2)
+
+    def test_report_page_is_staff_only(self):
+        self.client.get(reverse('posts:index'))
+        address = reverse('profiling')
+        self.assertEqual(self.client.get(address).status_code, 302)
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get(address), 'posts:index')
+
+    def test_command(self):
+        self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('profile_report', stdout=out)
+        self.assertIn('view=posts:index samples=1', out.getvalue())
+        call_command('profile_report', '--reset', stdout=StringIO())
+        self.assertEqual(profiling.get_report(), [])
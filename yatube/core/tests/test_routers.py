@@ -0,0 +1,141 @@
+import shutil
+import sqlite3
+import tempfile
+from os import path
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from core.middleware import ReplicaMiddleware
+from core.routers import PrimaryReplicaRouter, primary_reads, routing
+from posts.cache import cache
+from posts.models import Group, Post
+
+User = get_user_model()
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS, REPLICA_PIN_COOKIE='pin',
+                   REPLICA_PIN_SECONDS=5)
+class RouterTest(TestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def test_reads_use_primary_outside_requests(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_reads_use_replicas_when_enabled(self):
+        with routing(use_replicas=True):
+            self.assertIn(self.router.db_for_read(Post), REPLICAS)
+        with routing(use_replicas=False):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_reads_use_primary_without_replicas(self):
+        with routing(use_replicas=True):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_primary_reads_inside_replica_routing(self):
+        with routing(use_replicas=True) as state:
+            with primary_reads():
+                self.assertEqual(self.router.db_for_read(Post), 'default')
+                self.router.db_for_write(Post)
+            self.assertIn(self.router.db_for_read(Post), REPLICAS)
+        self.assertTrue(state.wrote)
+
+    def test_writes_use_primary_and_are_tracked(self):
+        with routing(use_replicas=True) as state:
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(state.wrote)
+
+    def test_replicas_are_not_migrated(self):
+        for alias in REPLICAS:
+            self.assertFalse(self.router.allow_migrate(alias, 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+    def run_middleware(self, request, write=False):
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            return HttpResponse(self.router.db_for_read(Post))
+        return ReplicaMiddleware(view)(request)
+
+    def test_safe_requests_read_from_replicas(self):
+        response = self.run_middleware(self.factory.get('/'))
+        self.assertIn(response.content.decode(), REPLICAS)
+        self.assertNotIn('pin', response.cookies)
+
+    def test_writes_pin_client_to_primary(self):
+        response = self.run_middleware(self.factory.post('/'), write=True)
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(response.cookies['pin']['max-age'], 5)
+        request = self.factory.get('/')
+        request.COOKIES['pin'] = '1'
+        response = self.run_middleware(request)
+        self.assertEqual(response.content, b'default')
+
+
+@override_settings(DATABASE_REPLICAS=['stale'])
+class StaleReplicaTest(TestCase):
+    """Реплика, которая не получила последнюю правку поста"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            text='Старый текст', author=cls.user, group=cls.group
+        )
+        cls.temp_dir = tempfile.mkdtemp()
+        name = path.join(cls.temp_dir, 'stale.sqlite3')
+        connection.ensure_connection()
+        target = sqlite3.connect(name)
+        # backup() ждал бы конца транзакции теста, дамп читает её данные.
+        # Полнотекстовый индекс реплике для этих страниц не нужен
+        for statement in connection.connection.iterdump():
+            if '_fts' not in statement:
+                target.execute(statement)
+        target.commit()
+        target.close()
+        connections.databases['stale'] = dict(
+            connections.databases['default'], NAME=name
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['stale'].close()
+        del connections.databases['stale']
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_cached_pages_are_not_built_from_stale_replica(self):
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('api:index'),
+        ]
+        etags = {address: self.client.get(address)['ETag']
+                 for address in addresses}
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(
+                    address, HTTP_IF_NONE_MATCH=etags[address]
+                )
+                self.assertContains(response, 'Новый текст')
+                self.assertContains(self.client.get(address), 'Новый текст')
@@ -0,0 +1,38 @@
+import sqlite3
+import tempfile
+from os import path
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core import sqlite
+
+
+class SQLitePragmasTest(TestCase):
+    def test_connection_is_configured(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0],
+                             settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+class SQLiteHelpersTest(SimpleTestCase):
+    def test_file_database_switches_to_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(path.join(directory, 'test.sqlite3'))
+            sqlite.apply_pragmas(db.cursor(), settings.SQLITE_PRAGMAS)
+            mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+            db.close()
+        self.assertEqual(mode, 'wal')
+
+    @mock.patch('core.sqlite._optimized_at', None)
+    def test_optimize_runs_once_per_interval(self):
+        cursor = mock.Mock()
+        self.assertTrue(sqlite.optimize_if_due(cursor, 60))
+        self.assertFalse(sqlite.optimize_if_due(cursor, 60))
+        cursor.execute.assert_called_once_with('PRAGMA optimize')
+        self.assertTrue(sqlite.optimize_if_due(cursor, 0))
@@ -0,0 +1,118 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+calls = []
+
+
+@tasks.register('tests.record')
+def record(*args):
+    calls.append(args)
+
+
+@tasks.register('tests.record_batch', batch=True)
+def record_batch(args_list):
+    calls.append(args_list)
+
+
+@tasks.register('tests.fail')
+def fail():
+    raise ValueError('Сбой')
+
+
+@tasks.register('tests.fail_in_transaction')
+def fail_in_transaction():
+    # Как bulk_create: atomic без точки сохранения
+    with transaction.atomic(savepoint=False):
+        raise ValueError('Сбой')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_MAX_ATTEMPTS=2,
+                   TASKS_RETRY_DELAY=10)
+class TasksTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_task_runs_once_and_is_deleted(self):
+        tasks.enqueue('tests.record', 1, 'a')
+        self.assertEqual(calls, [])
+        self.assertEqual(tasks.run_batch(), (1, 0))
+        self.assertEqual(calls, [(1, 'a')])
+        self.assertFalse(Task.objects.exists())
+
+    def test_pending_duplicates_are_ignored(self):
+        tasks.enqueue('tests.record', 1, key='same')
+        tasks.enqueue('tests.record', 1, key='same')
+        self.assertEqual(tasks.get_depth(), 1)
+        tasks.run_batch()
+        tasks.enqueue('tests.record', 1, key='same')
+        self.assertEqual(tasks.get_depth(), 1)
+
+    def test_related_tasks_are_batched(self):
+        for post_id in range(3):
+            tasks.enqueue('tests.record_batch', post_id)
+        tasks.run_batch()
+        self.assertEqual(calls, [[[0], [1], [2]]])
+
+    def test_failed_task_is_retried_with_backoff(self):
+        tasks.enqueue('tests.fail')
+        self.assertEqual(tasks.run_batch(), (0, 1))
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.PENDING)
+        self.assertGreater(task.run_at, timezone.now())
+        self.assertIn('Сбой', task.last_error)
+        # Время повтора ещё не пришло
+        self.assertEqual(tasks.run_batch(), (0, 0))
+        Task.objects.update(run_at=timezone.now())
+        tasks.run_batch()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_stale_task_is_released(self):
+        tasks.enqueue('tests.record', 1)
+        Task.objects.update(
+            status=Task.RUNNING,
+            started_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(tasks.run_batch(), (1, 0))
+
+    def test_stale_task_with_pending_duplicate_is_dropped(self):
+        tasks.enqueue('tests.record', 1, key='same')
+        Task.objects.update(
+            status=Task.RUNNING,
+            started_at=timezone.now() - timedelta(days=1)
+        )
+        tasks.enqueue('tests.record', 1, key='same')
+        self.assertEqual(tasks.run_batch(), (1, 0))
+        self.assertEqual(calls, [(1,)])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claimed_tasks_are_not_claimed_again(self):
+        tasks.enqueue('tests.record', 1)
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        tasks.enqueue('tests.record', 1)
+        self.assertEqual(calls, [(1,)])
+        self.assertFalse(Task.objects.exists())
+        with mock.patch('core.tasks.logger') as logger:
+            tasks.enqueue('tests.fail')
+        logger.exception.assert_called_once()
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_failure_keeps_transaction_usable(self):
+        with transaction.atomic():
+            with mock.patch('core.tasks.logger'):
+                tasks.enqueue('tests.fail_in_transaction')
+            self.assertFalse(Task.objects.exists())
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(KeyError):
+            tasks.enqueue('tests.missing')
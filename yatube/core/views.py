@@ -1,5 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from core import metrics, profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -11,3 +15,18 @@ def csrf_failure(request, reason=''):
 
 def server_error(request):
     return render(request, 'core/500.html')
+
+
+@staff_member_required
+def profiling_report(request):
+    """Сводка выборочного профилирования для администраторов"""
+    return render(
+        request, 'core/profiling.html', {'report': profiling.get_report()}
+    )
+
+
+def metrics_view(request):
+    """Метрики всех процессов в текстовом формате Prometheus"""
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
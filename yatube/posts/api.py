@@ -0,0 +1,177 @@
+"""JSON API лент и постов только для чтения.
+
+Строки читаются через .values() без создания моделей и шаблонов и сразу
+сериализуются в компактный JSON. Параметр ?fields=id,text оставляет
+в ответе и в SELECT только нужные клиенту поля, ?cursor= листает ленту
+курсором posts.paginators.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .conditional import (conditional_page, group_state, index_state,
+                          post_state, profile_state)
+from .models import Group, Post, User
+from .paginators import CursorPaginator
+from .storage import image_storage
+from .timeline import timeline_posts
+
+# Поле ответа -> колонка .values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+# Колонки, значения которых нужно преобразовать перед выдачей
+CONVERTERS = {
+    'image': lambda name: image_storage.url(name) if name else None,
+}
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def api_view(view):
+    """Отдаёт ошибки API и 404 в JSON вместо HTML-страниц"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return json_response({'error': 'Не найдено.'}, status=404)
+        except ApiError as error:
+            return json_response({'error': str(error)}, status=error.status)
+    return wrapper
+
+
+def get_fields(request, schema):
+    """Поля из ?fields=a,b в порядке запроса; по умолчанию все"""
+    names = [
+        name.strip() for name in request.GET.get('fields', '').split(',')
+        if name.strip()
+    ]
+    unknown = set(names) - set(schema)
+    if unknown:
+        raise ApiError(f'Неизвестные поля: {", ".join(sorted(unknown))}.')
+    return list(dict.fromkeys(names)) or list(schema)
+
+
+def get_columns(fields, schema, *extra):
+    return list(dict.fromkeys([schema[name] for name in fields] + list(extra)))
+
+
+def serialize(rows, fields, schema):
+    """Словари .values() -> словари ответа с именами полей API"""
+    columns = [
+        (name, schema[name], CONVERTERS.get(schema[name]))
+        for name in fields
+    ]
+    return [
+        {
+            name: convert(row[column]) if convert else row[column]
+            for name, column, convert in columns
+        }
+        for row in rows
+    ]
+
+
+def page_response(queryset, request, schema=POST_FIELDS,
+                  ordering=('-pub_date', '-id'), per_page=None):
+    """Страница строк queryset по курсору ?cursor="""
+    fields = get_fields(request, schema)
+    # Поля сортировки нужны курсору, даже если клиент их не просил
+    columns = get_columns(
+        fields, schema, *[name.lstrip('-') for name in ordering]
+    )
+    paginator = CursorPaginator(
+        queryset.values(*columns),
+        per_page or settings.ITEMS_COUNT,
+        ordering=ordering
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return json_response({
+        'results': serialize(page, fields, schema),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@require_safe
+@conditional_page(index_state)
+@api_view
+def index(request):
+    """Главная лента"""
+    return page_response(Post.objects.all(), request)
+
+
+@require_safe
+@conditional_page(group_state)
+@api_view
+def group_posts(request, slug):
+    """Лента сообщества"""
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return page_response(Post.objects.filter(group=group), request)
+
+
+@require_safe
+@conditional_page(profile_state)
+@api_view
+def profile(request, username):
+    """Посты пользователя"""
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return page_response(Post.objects.filter(author=author), request)
+
+
+@require_safe
+@api_view
+def follow_index(request):
+    """Лента подписок"""
+    if not request.user.is_authenticated:
+        raise ApiError('Нужна авторизация.', status=401)
+    return page_response(timeline_posts(request.user), request)
+
+
+@require_safe
+@conditional_page(post_state)
+@api_view
+def post_detail(request, post_id):
+    """Отдельный пост"""
+    fields = get_fields(request, POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *get_columns(fields, POST_FIELDS)
+    ).first()
+    if row is None:
+        raise Http404
+    return json_response(serialize([row], fields, POST_FIELDS)[0])
+
+
+@require_safe
+@api_view
+def post_comments(request, post_id):
+    """Комментарии поста по курсору"""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    return page_response(
+        post.comments.all(), request, COMMENT_FIELDS,
+        ordering=('created', 'id'), per_page=settings.COMMENTS_COUNT
+    )
@@ -0,0 +1,24 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+
+urlpatterns = [
+    # Главная лента
+    path('posts/', api.index, name='index'),
+    # Лента сообщества
+    path('group/<slug:slug>/', api.group_posts, name='group_list'),
+    # Посты пользователя
+    path('profile/<str:username>/', api.profile, name='profile'),
+    # Лента подписок
+    path('follow/', api.follow_index, name='follow_index'),
+    # Отдельный пост
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    # Комментарии поста
+    path(
+        'posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='post_comments'
+    ),
+]
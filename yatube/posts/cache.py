@@ -0,0 +1,93 @@
+"""Версионируемый кэш фрагментов лент.
+
+У каждой ленты (главная, группа, автор) есть область со своим номером
+поколения в кэше. Номер входит в ключ фрагмента и увеличивается сигналами
+при сохранении и удалении поста, поэтому старые фрагменты перестают
+читаться сразу, а не по истечении TTL. Рядом хранится время последнего
+изменения области — из него строится заголовок Last-Modified.
+
+Поколения действуют на все воркеры, только если кэш общий; в кэше
+процесса они живут settings.FEED_VERSION_TIMEOUT, иначе чужие правки
+не меняли бы ETag страниц.
+"""
+import time
+
+from django.conf import settings
+
+from core.cache import BufferedCounters, CacheProxy
+
+VERSION_KEY = 'feed:{scope}:version'
+CHANGED_KEY = 'feed:{scope}:changed'
+STATS_KEY = 'feed:stats:{name}'
+
+cache = CacheProxy('posts')
+stats = BufferedCounters(cache, STATS_KEY)
+
+
+def index_scope():
+    return 'index'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scopes(post, old_group_id=None):
+    """Области лент, в которых показывается пост"""
+    scopes = [index_scope(), author_scope(post.author_id)]
+    for group_id in {post.group_id, old_group_id} - {None}:
+        scopes.append(group_scope(group_id))
+    return scopes
+
+
+def get_versions(scopes):
+    """Текущие поколения областей одним запросом к кэшу"""
+    keys = {VERSION_KEY.format(scope=scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # Начинаем с текущего времени, а не с единицы: если ключ версии
+        # вытеснен, старые фрагменты не должны снова стать актуальными
+        cache.add(key, time.time_ns(), settings.FEED_VERSION_TIMEOUT)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(scope):
+    return get_versions([scope])[scope]
+
+
+def get_changed(scopes):
+    """Время последнего изменения самой свежей из областей"""
+    keys = [CHANGED_KEY.format(scope=scope) for scope in scopes]
+    changed = cache.get_many(keys)
+    for key in set(keys) - changed.keys():
+        # Время изменения неизвестно: считаем, что область изменилась сейчас
+        cache.add(key, time.time(), None)
+        changed[key] = cache.get(key)
+    return max(changed.values())
+
+
+def bump_versions(scopes):
+    for scope in scopes:
+        key = VERSION_KEY.format(scope=scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), settings.FEED_VERSION_TIMEOUT)
+    now = time.time()
+    cache.set_many(
+        {CHANGED_KEY.format(scope=scope): now for scope in scopes}, None
+    )
+
+
+def incr_stat(name, delta=1):
+    stats.incr(name, delta)
+
+
+def get_stats(names=('hits', 'misses')):
+    """Счётчики кэша, по умолчанию попадания и промахи фрагментов лент"""
+    return stats.get(names)
@@ -0,0 +1,146 @@
+"""Условные GET (ETag и Last-Modified) для лент и страницы поста.
+
+Валидаторы считаются без рендеринга: из поколений областей posts.cache,
+времени самого свежего поста или комментария и числа записей. Состояние
+страницы не зависит от пользователя: его ключ входит в ключ кэша целых
+страниц (core.holes), а пользовательская часть добавляется только в ETag.
+
+Поколения областей меняются сразу при записи, а реплики отстают, поэтому
+такие страницы читают из основной базы (core.routers.primary_reads):
+иначе старые данные с реплики попали бы в кэш и в ETag под новым ключом.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.views.decorators.http import condition
+
+from core.holes import cache_page_with_holes
+from core.routers import primary_reads
+
+from . import cache
+from .models import Follow, Group, Post, User
+
+
+class PageState:
+    """Общее для всех пользователей состояние страницы"""
+
+    def __init__(self, scopes, parts, newest=None):
+        versions = cache.get_versions(scopes)
+        self.key = ':'.join(
+            str(part) for part in [versions[scope] for scope in scopes] + parts
+        )
+        changed = datetime.fromtimestamp(
+            cache.get_changed(scopes), timezone.utc
+        )
+        self.last_modified = max(changed, newest) if newest else changed
+
+
+def index_state(request):
+    posts = Post.objects.aggregate(newest=Max('pub_date'), count=Count('id'))
+    return PageState(
+        [cache.index_scope()], [posts['count']], posts['newest']
+    )
+
+
+def group_state(request, slug):
+    group = Group.objects.filter(slug=slug).annotate(
+        newest=Max('posts__pub_date'), count=Count('posts')
+    ).values('pk', 'newest', 'count').first()
+    if group is None:
+        return None
+    return PageState(
+        [cache.group_scope(group['pk'])], [group['count']], group['newest']
+    )
+
+
+def profile_state(request, username):
+    author = User.objects.filter(username=username).annotate(
+        newest=Max('posts__pub_date')
+    ).values('pk', 'newest', 'stats__posts_count').first()
+    if author is None:
+        return None
+    return PageState(
+        [cache.author_scope(author['pk'])],
+        [author['pk'], author['stats__posts_count']],
+        author['newest']
+    )
+
+
+def post_state(request, post_id):
+    post = Post.objects.filter(pk=post_id).order_by().annotate(
+        last_comment=Max('comments__created')
+    ).values('author_id', 'pub_date', 'comments_count', 'last_comment').first()
+    if post is None:
+        return None
+    return PageState(
+        [cache.author_scope(post['author_id'])],
+        [post_id, post['comments_count']],
+        max(filter(None, [post['pub_date'], post['last_comment']]))
+    )
+
+
+def following_state(request, username):
+    """Подписка на автора; проверяется один раз за запрос для ETag и вью"""
+    if not hasattr(request, 'following'):
+        request.following = request.user.is_authenticated and (
+            Follow.objects.filter(
+                user=request.user, author__username=username
+            ).exists()
+        )
+    return request.following
+
+
+def get_page_state(get_state, request, *args, **kwargs):
+    """Состояние страницы, посчитанное один раз за запрос"""
+    if not hasattr(request, 'page_state'):
+        request.page_state = get_state(request, *args, **kwargs)
+    return request.page_state
+
+
+def conditional_page(get_state, get_personal=None):
+    """Отдаёт 304, если страница не менялась с прошлого визита.
+
+    get_personal добавляет к ETag то, что на странице зависит от
+    пользователя помимо шапки, например кнопку подписки.
+    """
+    def etag(request, *args, **kwargs):
+        state = get_page_state(get_state, request, *args, **kwargs)
+        if state is None:
+            return None
+        parts = [state.key, request.user.pk]
+        if get_personal is not None:
+            parts.append(get_personal(request, *args, **kwargs))
+        return hashlib.md5(
+            ':'.join(str(part) for part in parts).encode()
+        ).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = get_page_state(get_state, request, *args, **kwargs)
+        return state and state.last_modified
+
+    def decorator(view):
+        view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+        return primary_reads()(view)
+    return decorator
+
+
+def cached_page(get_state, get_personal=None):
+    """conditional_page поверх кэша страницы с дырками.
+
+    Ключ кэша — состояние страницы, так что после изменения постов
+    закэшированное тело перестаёт читаться сразу.
+    """
+    def page_key(request, *args, **kwargs):
+        state = get_page_state(get_state, request, *args, **kwargs)
+        return state and state.key
+
+    def decorator(view):
+        view = cache_page_with_holes(
+            settings.PAGE_CACHE_TIMEOUT, key_func=page_key, cache_alias='posts'
+        )(view)
+        return conditional_page(get_state, get_personal)(view)
+    return decorator
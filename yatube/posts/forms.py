@@ -2,9 +2,11 @@ from django import forms
 from django.utils.translation import gettext_lazy as _
 
 from .models import Comment, Post
+from .uploads import StreamedImageField
 
 
 class PostForm(forms.ModelForm):
+    image = StreamedImageField(label=_('Картинка'), required=False)
 
     class Meta:
         model = Post
@@ -0,0 +1,82 @@
+"""Кэш отрендеренных постов («матрёшка» внутри фрагментов лент).
+
+Каждый пост кэшируется отдельно по ключу с его id и версией
+(Post.version растёт при сохранении), поэтому правка поста сбрасывает
+только его фрагмент, а лента после сброса своего фрагмента собирается
+из уже готовых постов одним get_many.
+"""
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.profiling import record_cache
+
+from .cache import cache, get_stats, incr_stat
+from .models import Post
+
+FRAGMENT_KEY = 'post:{pk}:{version}:{template}'
+DEFAULT_TEMPLATE = 'includes/post_list.html'
+STATS = ('post_pages', 'post_cached_pages', 'post_hits', 'post_misses')
+
+
+def fragment_key(post, template_name=DEFAULT_TEMPLATE):
+    return FRAGMENT_KEY.format(
+        pk=post.pk, version=post.version, template=template_name
+    )
+
+
+def render_post(post, template_name=DEFAULT_TEMPLATE):
+    # Без request: фрагмент общий для всех пользователей
+    return render_to_string(template_name, {'post': post})
+
+
+def render_posts(posts, template_name=DEFAULT_TEMPLATE):
+    """Пары (пост, HTML) в исходном порядке.
+
+    Постам страницы достаточно id и версии (см. views.get_feed_context):
+    промахи загружаются целиком одним запросом, рендерятся и пишутся
+    обратно одним set_many.
+    """
+    keys = {fragment_key(post, template_name): post for post in posts}
+    fragments = cache.get_many(keys)
+    missing = {
+        key: post.pk for key, post in keys.items() if key not in fragments
+    }
+    if missing:
+        full_posts = Post.objects.for_feed().in_bulk(missing.values())
+        rendered = {
+            key: render_post(full_posts[pk], template_name)
+            for key, pk in missing.items() if pk in full_posts
+        }
+        cache.set_many(rendered, settings.POST_FRAGMENT_TIMEOUT)
+        fragments.update(rendered)
+    record_page(hits=len(keys) - len(missing), misses=len(missing))
+    return [
+        (post, mark_safe(fragments[key]))
+        for key, post in keys.items() if key in fragments
+    ]
+
+
+def record_page(hits, misses):
+    """Попадания и промахи по постам и число страниц, собранных из кэша"""
+    incr_stat('post_pages')
+    record_cache('post', hits, misses)
+    if hits:
+        incr_stat('post_hits', hits)
+    if misses:
+        incr_stat('post_misses', misses)
+    else:
+        incr_stat('post_cached_pages')
+
+
+def get_page_stats():
+    stats = get_stats(STATS)
+    requested = stats['post_hits'] + stats['post_misses']
+    stats['post_hit_ratio'] = (
+        stats['post_hits'] / requested if requested else 0
+    )
+    stats['cached_page_ratio'] = (
+        stats['post_cached_pages'] / stats['post_pages']
+        if stats['post_pages'] else 0
+    )
+    return stats
@@ -0,0 +1,40 @@
+"""Персональные фрагменты страниц постов для кэша страниц, см. core.holes"""
+from django.template.loader import render_to_string
+
+from core.holes import register
+
+from .conditional import following_state
+from .forms import CommentForm
+
+
+@register('feed_switcher')
+def feed_switcher(request):
+    return render_to_string('includes/switcher.html', request=request)
+
+
+@register('follow_button')
+def follow_button(request, username):
+    following = following_state(request, username)
+    return render_to_string(
+        'includes/follow_button.html',
+        {'username': username, 'following': following},
+        request=request
+    )
+
+
+@register('post_edit_link')
+def post_edit_link(request, post_id, author_id):
+    if str(request.user.pk) != author_id:
+        return ''
+    return render_to_string(
+        'includes/post_edit_link.html', {'post_id': post_id}, request=request
+    )
+
+
+@register('comment_form')
+def comment_form(request, post_id):
+    return render_to_string(
+        'includes/comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()},
+        request=request
+    )
@@ -0,0 +1,81 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from posts.cache import cache
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает размер ответа и задержку HTML-страниц лент '
+            'и их JSON API')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--fields', default='',
+                            help='Поля JSON API, например id,text')
+        parser.add_argument('--warm', action='store_true',
+                            help='Не сбрасывать кэш лент между запросами')
+
+    def get_pages(self):
+        """Пары (название, HTML-адрес, адрес API) для самых больших лент"""
+        post = Post.objects.order_by('-pub_date').first()
+        if post is None:
+            raise CommandError('В базе нет постов')
+        author = User.objects.annotate(
+            count=Count('posts')
+        ).order_by('-count').first()
+        pages = [
+            ('index', reverse('posts:index'), reverse('api:index')),
+            ('profile',
+             reverse('posts:profile', args=[author.username]),
+             reverse('api:profile', args=[author.username])),
+            ('post_detail',
+             reverse('posts:post_detail', args=[post.pk]),
+             reverse('api:post_detail', args=[post.pk])),
+        ]
+        group = Group.objects.annotate(
+            count=Count('posts')
+        ).order_by('-count').first()
+        if group is not None:
+            pages.append(
+                ('group_list',
+                 reverse('posts:group_list', args=[group.slug]),
+                 reverse('api:group_list', args=[group.slug]))
+            )
+        return pages
+
+    def measure(self, client, address, options, params=None):
+        latencies = []
+        size = 0
+        for _ in range(options['requests']):
+            if not options['warm']:
+                cache.clear()
+            started = time.perf_counter()
+            response = client.get(address, params or {})
+            latencies.append(time.perf_counter() - started)
+            size = len(response.content)
+        return size, statistics.median(latencies)
+
+    def handle(self, *args, **options):
+        client = Client()
+        params = {'fields': options['fields']} if options['fields'] else {}
+        self.stdout.write(
+            f'{"page":<12} {"html, Б":>9} {"api, Б":>9} '
+            f'{"html, мс":>9} {"api, мс":>9}'
+        )
+        for name, html_address, api_address in self.get_pages():
+            html_size, html_latency = self.measure(
+                client, html_address, options
+            )
+            api_size, api_latency = self.measure(
+                client, api_address, options, params
+            )
+            self.stdout.write(
+                f'{name:<12} {html_size:>9} {api_size:>9} '
+                f'{html_latency * 1e3:>9.2f} {api_latency * 1e3:>9.2f}'
+            )
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+
+
+def generate(name):
+    try:
+        return thumbnails.generate(name)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры для всех картинок в media/posts/ параллельно'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.POST_THUMBNAIL_WORKERS
+        )
+        parser.add_argument('--directory', default='posts')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not default_storage.exists(directory):
+            self.stdout.write(f'Каталог {directory} пуст')
+            return
+        _, files = default_storage.listdir(directory)
+        names = [f'{directory}/{name}' for name in files]
+        failed = 0
+        total = 0
+        for name, result in self.run(names, options['workers']):
+            if isinstance(result, Exception):
+                failed += 1
+                self.stderr.write(f'{name}: {result}')
+            else:
+                total += result
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {len(names)}, миниатюр: {total}, ошибок: {failed}'
+        ))
+
+    def run(self, names, workers):
+        """Пары (имя, число миниатюр или исключение)"""
+        if workers <= 1:
+            for name in names:
+                try:
+                    yield name, thumbnails.generate(name)
+                except Exception as error:
+                    yield name, error
+            return
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(generate, name): name for name in names}
+            for future, name in futures.items():
+                try:
+                    yield name, future.result()
+                except Exception as error:
+                    yield name, error
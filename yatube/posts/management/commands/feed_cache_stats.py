@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from posts.cache import get_stats
+from posts.fragments import get_page_stats
+
+
+class Command(BaseCommand):
+    help = ('Показывает попадания и промахи кэша фрагментов лент '
+            'и отдельных постов')
+
+    def handle(self, *args, **options):
+        stats = get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f"hits={stats['hits']} misses={stats['misses']} "
+            f'hit_ratio={ratio:.2%}'
+        )
+        posts = get_page_stats()
+        self.stdout.write(
+            f"post_hits={posts['post_hits']} "
+            f"post_misses={posts['post_misses']} "
+            f"post_hit_ratio={posts['post_hit_ratio']:.2%} "
+            f"pages={posts['post_pages']} "
+            f"cached_pages={posts['cached_page_ratio']:.2%}"
+        )
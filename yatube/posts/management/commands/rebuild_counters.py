@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Comment, Post, UserStats, count_related
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            UserStats.rebuild()
+            Post.objects.update(
+                comments_count=count_related(Comment, 'post')
+            )
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов и комментариев'
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write('Полнотекстовый индекс нужен только для SQLite')
+            return
+        with transaction.atomic():
+            search.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран'))
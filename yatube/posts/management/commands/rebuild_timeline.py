@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help='id пользователей; по умолчанию ленты всех пользователей'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            timeline.rebuild(options['user_ids'] or None)
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
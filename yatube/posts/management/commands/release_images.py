@@ -0,0 +1,56 @@
+import os
+from contextlib import suppress
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import HIDDEN_SUFFIX, image_storage
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки без постов, которые release оставил из-за '
+            'недавней загрузки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='posts')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not image_storage.exists(directory):
+            self.stdout.write(f'Каталог {directory} пуст')
+            return
+        _, files = image_storage.listdir(directory)
+        names = {f'{directory}/{name}' for name in files}
+        referenced = set(
+            Post.objects.filter(image__in=[
+                name[:-len(HIDDEN_SUFFIX)]
+                if name.endswith(HIDDEN_SUFFIX) else name
+                for name in names
+            ]).values_list('image', flat=True)
+        )
+        released = kept = 0
+        for name in sorted(names):
+            if name.endswith(HIDDEN_SUFFIX):
+                # release прервался между тем, как спрятал и удалил файл
+                self.recover(name[:-len(HIDDEN_SUFFIX)], referenced)
+            elif name.endswith('.part') or name in referenced:
+                continue
+            elif thumbnails.release(name):
+                released += 1
+            else:
+                kept += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено картинок: {released}, оставлено до следующего '
+            f'запуска: {kept}'
+        ))
+
+    def recover(self, name, referenced):
+        hidden = image_storage.path(name) + HIDDEN_SUFFIX
+        # Файл мог убрать или вернуть сам release, который ещё работает
+        with suppress(FileNotFoundError):
+            if name in referenced:
+                image_storage.unhide(name, hidden)
+            else:
+                os.remove(hidden)
+                thumbnails.release(name)
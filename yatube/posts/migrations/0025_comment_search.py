@@ -0,0 +1,52 @@
+from django.db import migrations
+
+TOKENIZE = "tokenize = 'unicode61 remove_diacritics 2'"
+
+
+def split_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE posts_post_fts USING fts5(text, {TOKENIZE})'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts (rowid, text) '
+        'SELECT id, text FROM posts_post'
+    )
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS posts_comment_fts USING fts5('
+        f'text, post_id UNINDEXED, {TOKENIZE})'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_comment_fts (rowid, text, post_id) '
+        'SELECT id, text, post_id FROM posts_comment'
+    )
+
+
+def merge_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE IF EXISTS posts_comment_fts')
+    schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+        f'text, comments, {TOKENIZE})'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts (rowid, text, comments) '
+        'SELECT p.id, p.text, COALESCE(('
+        "SELECT group_concat(c.text, ' ') FROM posts_comment c "
+        "WHERE c.post_id = p.id), '') FROM posts_post p"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_post_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(split_search_index, merge_search_index),
+    ]
@@ -1,5 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .storage import image_storage
 
 User = get_user_model()
 
@@ -13,6 +17,21 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, без лишних колонок"""
+        return self.select_related('author', 'group').defer(
+            'author__password',
+            'author__last_login',
+            'author__is_superuser',
+            'author__email',
+            'author__is_staff',
+            'author__is_active',
+            'author__date_joined',
+            'group__description',
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         'Текст поста',
@@ -40,11 +59,34 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=image_storage,
         blank=True
     )
 
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+    # Растёт при каждом сохранении; входит в ключ кэша фрагмента поста
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=0,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(name='post_date_id_idx',
+                         fields=['-pub_date', '-id']),
+            models.Index(name='post_group_date_idx',
+                         fields=['group', '-pub_date']),
+            models.Index(name='post_author_date_idx',
+                         fields=['author', '-pub_date']),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -71,6 +113,13 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(name='comment_post_created_idx',
+                         fields=['post', 'created']),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -89,3 +138,99 @@ class Follow(models.Model):
             models.UniqueConstraint(name='unique_follow', fields=['author',
                                                                   'user'])
         ]
+        indexes = [
+            models.Index(name='follow_user_author_idx',
+                         fields=['user', 'author']),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами posts.signals"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Пересчитывает счётчики пользователей (по умолчанию всех)"""
+        users = User.objects.all()
+        if user_ids is not None:
+            users = users.filter(pk__in=user_ids)
+        missing = users.exclude(pk__in=cls.objects.values('user'))
+        cls.objects.bulk_create(
+            cls(user_id=pk) for pk in missing.values_list('pk', flat=True)
+        )
+        cls.objects.filter(user__in=users).update(
+            posts_count=count_related(Post, 'author'),
+            followers_count=count_related(Follow, 'author'),
+            following_count=count_related(Follow, 'user'),
+        )
+
+
+def count_related(model, field):
+    """Подзапрос с количеством строк model, ссылающихся на текущую строку"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок, см. posts.timeline"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(name='unique_timeline_entry',
+                                    fields=['user', 'post'])
+        ]
+        indexes = [
+            models.Index(name='timeline_user_date_idx',
+                         fields=['user', '-pub_date', '-post'])
+        ]
+
+
+class ImageVariant(models.Model):
+    """Готовый вариант картинки поста, см. posts.thumbnails"""
+    source = models.CharField('Исходная картинка', max_length=255)
+    name = models.CharField('Файл варианта', max_length=255)
+    format = models.CharField('Формат', max_length=10)
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(name='unique_image_variant',
+                                    fields=['source', 'format', 'width'])
+        ]
@@ -0,0 +1,117 @@
+import base64
+import json
+from collections.abc import Mapping
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации"""
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, 1, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Page cursor {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу сортировки без COUNT(*) и OFFSET.
+
+    Курсор — непрозрачный токен с направлением и значениями полей
+    сортировки у крайней записи страницы, поэтому запрос любой страницы
+    сводится к диапазонному сканированию индекса.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def encode_cursor(self, obj, direction):
+        # Строки .values() — словари, модели — объекты
+        if isinstance(obj, Mapping):
+            values = [str(obj[name]) for name in self.fields]
+        else:
+            values = [str(getattr(obj, name)) for name in self.fields]
+        raw = json.dumps([direction] + values).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения) или None для битого токена"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, *values = json.loads(raw)
+            if direction not in (NEXT, PREVIOUS):
+                return None
+            if len(values) != len(self.fields):
+                return None
+            model = self.object_list.model
+            values = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if any(value is None for value in values):
+            return None
+        return direction, values
+
+    def _seek(self, values, forward):
+        """Условие «строго после»/«строго до» курсора по полям сортировки"""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            equal = {field: value for field, value
+                     in zip(self.fields[:i], values[:i])}
+            condition |= Q(**equal, **{f'{name}__{lookup}': values[i]})
+        return condition
+
+    def get_page(self, cursor):
+        decoded = self.decode_cursor(cursor) if cursor else None
+        if decoded is None:
+            items = list(self.object_list[:self.per_page + 1])
+            has_more, has_before = len(items) > self.per_page, False
+            items = items[:self.per_page]
+            cursor = None
+        else:
+            direction, values = decoded
+            forward = direction == NEXT
+            queryset = self.object_list.filter(self._seek(values, forward))
+            if not forward:
+                queryset = queryset.reverse()
+            items = list(queryset[:self.per_page + 1])
+            has_more = len(items) > self.per_page
+            items = items[:self.per_page]
+            if forward:
+                has_before = True
+            else:
+                items.reverse()
+                has_more, has_before = True, has_more
+        next_cursor = previous_cursor = None
+        if items and has_more:
+            next_cursor = self.encode_cursor(items[-1], NEXT)
+        if items and has_before:
+            previous_cursor = self.encode_cursor(items[0], PREVIOUS)
+        return CursorPage(items, self, cursor, next_cursor, previous_cursor)
+
+    def page(self, cursor):
+        return self.get_page(cursor)
@@ -0,0 +1,140 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+В SQLite используются виртуальные таблицы FTS5: в одной rowid совпадает
+с id поста, в другой — с id комментария. Комментарии индексируются
+отдельно, чтобы новый комментарий не переиндексировал весь пост вместе
+со всеми остальными. Сигналы posts.signals держат таблицы в актуальном
+состоянии через очередь задач (posts.tasks), а команда
+rebuild_search_index пересобирает их целиком. На других СУБД поиск
+откатывается к LIKE по тексту поста.
+"""
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+# Маркеры подсветки не встречаются в тексте и переживают экранирование
+MARK_START, MARK_END = '\x02', '\x03'
+POST_SQL = f'INSERT INTO {TABLE} (rowid, text) SELECT id, text FROM posts_post'
+COMMENT_SQL = (
+    f'INSERT INTO {COMMENT_TABLE} (rowid, text, post_id) '
+    'SELECT id, text, post_id FROM posts_comment'
+)
+# Лучшее совпадение на пост: по его тексту или по одному из комментариев
+MATCHES_SQL = (
+    f'SELECT rowid AS post_id, rank, snippet({TABLE}, 0, %s, %s, %s, 24) '
+    f'AS snippet FROM {TABLE} WHERE {TABLE} MATCH %s UNION ALL '
+    f'SELECT post_id, rank, snippet({COMMENT_TABLE}, 0, %s, %s, %s, 24) '
+    f'FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s'
+)
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+def reindex(table, source_sql, ids):
+    """Заменяет строки индекса; строки удалённых объектов просто уходят"""
+    ids = list(ids)
+    if not is_supported() or not ids:
+        return
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE rowid IN ({placeholders})', ids
+        )
+        cursor.execute(f'{source_sql} WHERE id IN ({placeholders})', ids)
+
+
+def index_posts(post_ids):
+    """Переиндексирует тексты постов"""
+    reindex(TABLE, POST_SQL, post_ids)
+
+
+def index_comments(comment_ids):
+    """Переиндексирует только переданные комментарии"""
+    reindex(COMMENT_TABLE, COMMENT_SQL, comment_ids)
+
+
+def rebuild():
+    """Пересобирает индексы INSERT ... SELECT и сжимает их"""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        for table, source_sql in ((TABLE, POST_SQL),
+                                  (COMMENT_TABLE, COMMENT_SQL)):
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(source_sql)
+            cursor.execute(
+                f"INSERT INTO {table} ({table}) VALUES ('optimize')"
+            )
+
+
+def build_match(query):
+    """Запрос FTS5 из пользовательского ввода: все слова, без операторов"""
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchResults:
+    """Ранжированная выдача FTS5, которую можно отдать в Paginator"""
+
+    def __init__(self, match):
+        self.match = match
+
+    def params(self):
+        return [MARK_START, MARK_END, '…', self.match] * 2
+
+    def count(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(DISTINCT post_id) FROM ({MATCHES_SQL})',
+                self.params()
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        with connection.cursor() as cursor:
+            # SQLite берёт snippet из строки, на которой достигнут MIN
+            cursor.execute(
+                f'SELECT post_id, snippet, MIN(rank) AS best '
+                f'FROM ({MATCHES_SQL}) GROUP BY post_id '
+                'ORDER BY best LIMIT %s OFFSET %s',
+                self.params() + [item.stop - start, start]
+            )
+            rows = [(pk, snippet) for pk, snippet, _ in cursor.fetchall()]
+        posts = Post.objects.for_feed().in_bulk([pk for pk, _ in rows])
+        results = []
+        for pk, snippet in rows:
+            if pk in posts:
+                posts[pk].snippet = highlight(snippet)
+                results.append(posts[pk])
+        return results
+
+
+def search_posts(query):
+    """Посты по запросу, самые релевантные сверху"""
+    match = build_match(query)
+    if not match:
+        return Post.objects.none()
+    if not is_supported():
+        return Post.objects.for_feed().filter(text__icontains=query)
+    return SearchResults(match)
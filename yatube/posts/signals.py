@@ -0,0 +1,237 @@
+from django.conf import settings
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core import tasks
+
+from . import cache, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля, которые показывают страницы групп, профилей и постов
+GROUP_FIELDS = ('title', 'slug', 'description')
+USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def change_stats(user_id, field, delta):
+    """Сдвигает счётчик пользователя одним UPDATE"""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    if not stats.update(**{field: F(field) + delta}) and delta > 0:
+        # Строки со счётчиками ещё нет: считаем их с нуля
+        UserStats.rebuild([user_id])
+
+
+def enqueue_index(post_id):
+    """Переиндексация поста; повторы до выполнения задачи схлопываются"""
+    tasks.enqueue('posts.index', post_id, key=f'index:{post_id}')
+
+
+def enqueue_comment_index(comment_id):
+    """Комментарий индексируется сам по себе, без остальных комментариев"""
+    tasks.enqueue('posts.index_comment', comment_id,
+                  key=f'index_comment:{comment_id}')
+
+
+def remember_fields(instance, fields, update_fields):
+    """Старые значения fields, если сохранение может их изменить"""
+    instance._old_fields = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(fields) & set(update_fields):
+        # Например, вход пользователя сохраняет только last_login
+        return
+    instance._old_fields = type(instance)._default_manager.filter(
+        pk=instance.pk
+    ).values(*fields).first()
+
+
+def fields_changed(instance, fields):
+    old = getattr(instance, '_old_fields', None)
+    return old is not None and any(
+        old[field] != getattr(instance, field) for field in fields
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_state(sender, instance, raw=False, update_fields=None,
+                         **kwargs):
+    if not raw:
+        remember_fields(instance, GROUP_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not fields_changed(instance, GROUP_FIELDS):
+        return
+    posts = Post.objects.filter(group=instance).order_by()
+    # Страница группы и страницы её постов, где показано название
+    scopes = [cache.group_scope(instance.pk)] + [
+        cache.author_scope(author_id)
+        for author_id in posts.values_list('author_id', flat=True).distinct()
+    ]
+    if instance._old_fields['slug'] != instance.slug:
+        # Фрагменты постов в лентах ссылаются на группу по slug
+        posts.update(version=F('version') + 1)
+        scopes.append(cache.index_scope())
+    cache.bump_versions(scopes)
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления посты уже не ссылаются на группу (SET_NULL)
+    instance._posts = list(
+        Post.objects.filter(group=instance).values_list('pk', 'author_id')
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    posts = getattr(instance, '_posts', [])
+    # SET_NULL обновляет посты одним UPDATE без post_save, а их фрагменты
+    # ссылаются на удалённую группу
+    Post.objects.filter(pk__in=[pk for pk, _ in posts]).update(
+        version=F('version') + 1
+    )
+    cache.bump_versions(
+        [cache.group_scope(instance.pk), cache.index_scope()]
+        + [cache.author_scope(author_id)
+           for author_id in {author_id for _, author_id in posts}]
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_user_state(sender, instance, raw=False, update_fields=None,
+                        **kwargs):
+    if not raw:
+        remember_fields(instance, USER_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or not fields_changed(instance, USER_FIELDS):
+        return
+    posts = Post.objects.filter(author=instance).order_by()
+    # Имя автора есть во фрагментах его постов, а значит и во всех лентах
+    # с ними: новые версии постов и поколения этих лент
+    posts.update(version=F('version') + 1)
+    scopes = [cache.author_scope(instance.pk), cache.index_scope()] + [
+        cache.group_scope(group_id)
+        for group_id in posts.exclude(group=None).values_list(
+            'group_id', flat=True
+        ).distinct()
+    ]
+    if instance._old_fields['username'] != instance.username:
+        # Комментарии подписаны username, а страницы постов других авторов
+        # входят в области этих авторов
+        scopes += [
+            cache.author_scope(author_id)
+            for author_id in Post.objects.filter(
+                comments__author=instance
+            ).order_by().values_list('author_id', flat=True).distinct()
+        ]
+    cache.bump_versions(scopes)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_state(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Файл новой загрузки ещё не сохранён в хранилище
+    instance._image_uploaded = bool(
+        instance.image and not instance.image._committed
+    )
+    # Не instance.pk: create(pk=...) вставляет строку, а F() в INSERT нельзя
+    if not instance._state.adding:
+        # Новая версия сбрасывает кэш фрагмента поста (posts.fragments)
+        instance.version = F('version') + 1
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if not isinstance(instance.version, int):
+        instance.refresh_from_db(fields=['version'])
+    old_group_id = getattr(instance, '_old_group_id', None)
+    cache.bump_versions(cache.post_scopes(instance, old_group_id))
+    enqueue_index(instance.pk)
+    if instance.image:
+        sanitize = getattr(instance, '_image_uploaded', False)
+        tasks.enqueue(
+            'posts.publish_image', instance.image.name, sanitize,
+            key=f'image:{instance.image.name}:{int(sanitize)}'
+        )
+    old_image = getattr(instance, '_old_image', None)
+    if old_image and old_image != instance.image.name:
+        thumbnails.release_on_commit(old_image)
+    if created:
+        change_stats(instance.author_id, 'posts_count', 1)
+        tasks.enqueue('posts.fan_out', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    cache.bump_versions(cache.post_scopes(instance))
+    enqueue_index(instance.pk)
+    change_stats(instance.author_id, 'posts_count', -1)
+    if instance.image:
+        thumbnails.release_on_commit(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1
+        )
+    enqueue_comment_index(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    Post.objects.filter(
+        pk=instance.post_id, comments_count__gt=0
+    ).update(comments_count=F('comments_count') - 1)
+    enqueue_comment_index(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_stats(instance.user_id, 'following_count', 1)
+        change_stats(instance.author_id, 'followers_count', 1)
+        tasks.enqueue(
+            'posts.backfill_timeline', instance.user_id, instance.author_id,
+            key=f'backfill:{instance.user_id}:{instance.author_id}'
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_stats(instance.user_id, 'following_count', -1)
+    change_stats(instance.author_id, 'followers_count', -1)
+    timeline.trim(instance.user_id, instance.author_id)
+    if UserStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT - 1
+    ).exists():
+        # Автор перестал быть знаменитостью: его посты больше не
+        # подмешиваются при чтении, а в ленты они не раскладывались
+        tasks.enqueue(
+            'posts.backfill_followers', instance.author_id,
+            key=f'backfill_followers:{instance.author_id}'
+        )
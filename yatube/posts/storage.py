@@ -0,0 +1,94 @@
+"""Хранилище картинок постов с адресацией по содержимому.
+
+Файл называется sha256 своих байтов, поэтому одинаковые загрузки ложатся
+в один файл и пишутся на диск один раз. Счётчиком ссылок служит сама база:
+файл удаляется, когда на него не ссылается ни один пост
+(posts.thumbnails.release). Повторная загрузка обновляет mtime уже
+записанного файла: пока её пост не сохранён, это единственная ссылка.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HIDDEN_SUFFIX = '.released'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который именует файлы хешем содержимого"""
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory = posixpath.dirname(name)
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Файл с таким именем уже содержит те же самые байты
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        try:
+            # Файл уже есть: отмечаем загрузку, чтобы release его не удалил
+            os.utime(full_path)
+            return name
+        except FileNotFoundError:
+            pass
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем: параллельная
+        # загрузка тех же байтов просто перезапишет файл идентичным
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    temp.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def hide(self, name):
+        """Убирает файл из-под имени перед удалением.
+
+        Загрузка тех же байтов после этого запишет файл заново. Возвращает
+        путь спрятанного файла или None, если файла нет.
+        """
+        hidden = self.path(name) + HIDDEN_SUFFIX
+        try:
+            os.replace(self.path(name), hidden)
+        except FileNotFoundError:
+            return None
+        return hidden
+
+    def unhide(self, name, hidden):
+        # Если файл уже записан заново, байты те же самые
+        os.replace(hidden, self.path(name))
+
+    def touched_within(self, path, seconds):
+        return time.time() - os.path.getmtime(path) < seconds
+
+
+image_storage = ContentAddressedStorage()
@@ -0,0 +1,43 @@
+"""Фоновые задачи постов для очереди core.tasks"""
+from core.tasks import register
+
+from . import search, thumbnails, timeline
+from .models import Follow, Post
+from .storage import image_storage
+
+
+@register('posts.index', batch=True)
+def index_posts(args_list):
+    search.index_posts({post_id for post_id, in args_list})
+
+
+@register('posts.index_comment', batch=True)
+def index_comments(args_list):
+    search.index_comments({comment_id for comment_id, in args_list})
+
+
+@register('posts.fan_out')
+def fan_out(post_id):
+    post = Post.objects.filter(pk=post_id).only('author', 'pub_date').first()
+    # Пост могли удалить, пока задача ждала
+    if post is not None:
+        timeline.fan_out(post)
+
+
+@register('posts.backfill_timeline')
+def backfill_timeline(user_id, author_id):
+    # Пользователь мог отписаться, пока задача ждала
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        timeline.backfill(user_id, author_id)
+
+
+@register('posts.backfill_followers')
+def backfill_followers(author_id):
+    timeline.backfill_followers(author_id)
+
+
+@register('posts.publish_image')
+def publish_image(name, sanitize):
+    # Картинку могли удалить вместе с постом, пока задача ждала
+    if image_storage.exists(name):
+        thumbnails.publish(name, sanitize)
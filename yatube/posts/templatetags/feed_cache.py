@@ -0,0 +1,53 @@
+from django import template
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+
+from core.profiling import record_cache
+from posts import cache as feed_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, scope, vary_on):
+        self.nodelist = nodelist
+        self.scope = scope
+        self.vary_on = vary_on
+
+    def render(self, context):
+        scope = self.scope.resolve(context)
+        vary_on = [feed_cache.get_version(scope)]
+        vary_on += [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(f'feed:{scope}', vary_on)
+        value = feed_cache.cache.get(key)
+        # Тип ленты без id: feed:index, feed:group, feed:author
+        cache_name = f"feed:{scope.split(':')[0]}"
+        if value is None:
+            feed_cache.incr_stat('misses')
+            record_cache(cache_name, misses=1)
+            value = self.nodelist.render(context)
+            feed_cache.cache.set(key, value, settings.FEED_CACHE_TIMEOUT)
+        else:
+            feed_cache.incr_stat('hits')
+            record_cache(cache_name, hits=1)
+        return value
+
+
+@register.tag
+def feedcache(parser, token):
+    """Кэширует фрагмент ленты до изменения постов в её области.
+
+    {% feedcache feed_scope page_obj %} ... {% endfeedcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 1 argument."
+        )
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,15 @@
+from django import template
+
+from posts import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_fragments(posts, template_name=fragments.DEFAULT_TEMPLATE):
+    """Посты страницы из кэша фрагментов.
+
+    {% post_fragments page_obj as items %}
+    {% for post, html in items %}{{ html }}{% endfor %}
+    """
+    return fragments.render_posts(posts, template_name)
@@ -0,0 +1,11 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_picture(image):
+    """Варианты картинки поста или None, пока они в очереди"""
+    return thumbnails.get_picture(image)
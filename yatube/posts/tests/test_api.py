@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.cache import cache
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(ITEMS_COUNT=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_are_paginated_by_cursor(self):
+        addresses = [
+            reverse('api:index'),
+            reverse('api:group_list', args=[self.group.slug]),
+            reverse('api:profile', args=[self.author.username]),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                first = self.client.get(address).json()
+                self.assertEqual([post['text'] for post in first['results']],
+                                 ['Пост 2', 'Пост 1'])
+                second = self.client.get(
+                    address, {'cursor': first['next']}
+                ).json()
+                self.assertEqual([post['text'] for post in second['results']],
+                                 ['Пост 0'])
+                self.assertIsNone(second['next'])
+
+    def test_post_fields(self):
+        data = self.client.get(
+            reverse('api:post_detail', args=[self.posts[0].id])
+        ).json()
+        self.assertEqual(data['author'], 'AvTor')
+        self.assertEqual(data['group'], 'test-slug')
+        self.assertEqual(data['comments_count'], 1)
+        self.assertIsNone(data['image'])
+
+    def test_sparse_fields(self):
+        address = reverse('api:index')
+        data = self.client.get(address, {'fields': 'id,text'}).json()
+        self.assertEqual(list(data['results'][0]), ['id', 'text'])
+        # Курсор работает и без полей сортировки в ответе
+        data = self.client.get(
+            address, {'fields': 'text', 'cursor': data['next']}
+        ).json()
+        self.assertEqual(data['results'], [{'text': 'Пост 0'}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse('api:index'), {'fields': 'email'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json()['error'])
+
+    def test_missing_objects_are_json_404(self):
+        addresses = [
+            reverse('api:post_detail', args=[0]),
+            reverse('api:group_list', args=['missing']),
+            reverse('api:profile', args=['missing']),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+
+    def test_follow_feed_requires_login(self):
+        address = reverse('api:follow_index')
+        self.assertEqual(self.client.get(address).status_code, 401)
+        self.client.force_login(self.user)
+        data = self.client.get(address).json()
+        self.assertEqual(len(data['results']), 2)
+
+    def test_comments(self):
+        data = self.client.get(
+            reverse('api:post_comments', args=[self.posts[0].id])
+        ).json()
+        self.assertEqual(data['results'][0]['author'], 'Yaroslav')
+        self.assertIsNone(data['next'])
+
+    def test_feed_reads_posts_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('api:profile', args=[self.author.username])
+            )
+        # Состояние страницы для ETag и сама страница
+        self.assertEqual(
+            len([query for query in queries
+                 if 'posts_post' in query['sql']]),
+            2
+        )
+
+    def test_not_modified(self):
+        address = reverse('api:index')
+        etag = self.client.get(address)['ETag']
+        response = self.client.get(address, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
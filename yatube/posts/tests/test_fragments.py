@@ -0,0 +1,97 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import fragments
+from posts.cache import cache
+from posts.models import Post
+
+User = get_user_model()
+
+
+class PostFragmentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def feed(self):
+        return list(Post.objects.for_feed())
+
+    def page(self):
+        return list(Post.objects.only('id', 'version', 'pub_date'))
+
+    def test_cached_fragments_are_not_rendered_again(self):
+        first = fragments.render_posts(self.feed())
+        with mock.patch('posts.fragments.render_post') as render_post:
+            second = fragments.render_posts(self.feed())
+        render_post.assert_not_called()
+        self.assertEqual(first, second)
+        self.assertIn('Пост 0', str(second[-1][1]))
+
+    def test_edit_invalidates_only_that_post(self):
+        fragments.render_posts(self.feed())
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.authorized_client.post(
+            reverse('posts:post_edit', args=[post.pk]),
+            data={'text': 'Отредактированный пост'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.version, self.posts[0].version + 1)
+        with mock.patch('posts.fragments.render_post',
+                        wraps=fragments.render_post) as render_post:
+            items = fragments.render_posts(self.feed())
+        render_post.assert_called_once_with(post, fragments.DEFAULT_TEMPLATE)
+        self.assertIn('Отредактированный пост', str(dict(items)[post]))
+
+    def test_post_with_explicit_pk_is_created(self):
+        post = Post.objects.create(pk=500, text='Пост 500', author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.version, 0)
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.version, 1)
+
+    def test_templates_are_cached_separately(self):
+        fragments.render_posts(self.feed())
+        items = fragments.render_posts(
+            self.feed(), 'includes/profile_post.html'
+        )
+        self.assertNotIn('Автор:', str(items[0][1]))
+
+    def test_misses_are_loaded_in_one_query(self):
+        page = self.page()
+        with CaptureQueriesContext(connection) as cold:
+            items = fragments.render_posts(page)
+        self.assertEqual(len(items), len(self.posts))
+        self.assertEqual(len(cold), 1)
+        with self.assertNumQueries(0):
+            fragments.render_posts(page)
+
+    def test_page_stats(self):
+        fragments.render_posts(self.page())
+        fragments.render_posts(self.page())
+        stats = fragments.get_page_stats()
+        self.assertEqual(stats['post_pages'], 2)
+        self.assertEqual(stats['post_hits'], 3)
+        self.assertEqual(stats['post_misses'], 3)
+        self.assertEqual(stats['cached_page_ratio'], 0.5)
+        out = StringIO()
+        call_command('feed_cache_stats', stdout=out)
+        self.assertIn('post_hit_ratio=50.00%', out.getvalue())
@@ -1,7 +1,10 @@
+from unittest import skipUnless
+
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -52,3 +55,46 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class IndexesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Тестовая пост',
+        )
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_feed_queries_use_indexes(self):
+        access_paths = {
+            'post_date_id_idx':
+                Post.objects.order_by('-pub_date', '-id')[:10],
+            'post_group_date_idx':
+                self.group.posts.all()[:10],
+            'post_author_date_idx':
+                self.user.posts.all()[:10],
+            'comment_post_created_idx':
+                self.post.comments.all(),
+            'follow_user_author_idx':
+                Follow.objects.filter(user=self.user).values('author'),
+        }
+        for index, queryset in access_paths.items():
+            with self.subTest(index=index):
+                plan = self.query_plan(queryset)
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,95 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from posts.search import COMMENT_TABLE, TABLE
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Индекс FTS5 есть только в SQLite')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.post = Post.objects.create(
+            text='Сегодня <b>пекли</b> пироги с капустой',
+            author=cls.user,
+        )
+        cls.other_post = Post.objects.create(
+            text='Пироги, пироги и ещё раз пироги',
+            author=cls.user,
+        )
+        Post.objects.create(text='Про погоду', author=cls.user)
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_results(self):
+        self.assertEqual(self.search('пироги'),
+                         [self.other_post, self.post])
+        self.assertEqual(self.search('пироги капуста'), [])
+        self.assertEqual(self.search('пироги капустой'), [self.post])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        post = self.search('капустой')[0]
+        self.assertIn('<mark>капустой</mark>', post.snippet)
+        self.assertIn('&lt;b&gt;', post.snippet)
+
+    def test_operators_in_query_are_ignored(self):
+        self.assertEqual(self.search('"пироги" -(*'), [
+            self.other_post, self.post
+        ])
+        self.assertEqual(self.search('***'), [])
+
+    def test_comments_edits_and_deletes_are_indexed(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Очень вкусно')
+        self.assertEqual(self.search('вкусно'), [self.post])
+        comment.delete()
+        self.assertEqual(self.search('вкусно'), [])
+        Comment.objects.create(post=self.other_post, author=self.user,
+                               text='Пироги удались')
+        self.assertEqual(self.search('пироги удались'), [self.other_post])
+        post = Post.objects.get(pk=self.other_post.pk)
+        post.text = 'Блины'
+        post.save()
+        self.assertEqual(self.search('блины'), [post])
+        post.delete()
+        self.assertEqual(self.search('блины'), [])
+
+    def test_search_is_paginated(self):
+        Post.objects.bulk_create(
+            Post(text=f'Пирожки номер {i}', author=self.user)
+            for i in range(15)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'пирожки', 'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 5)
+        self.assertContains(response, '?q=%D0%BF%D0%B8%D1%80%D0%BE%D0%B6'
+                                      '%D0%BA%D0%B8&amp;page=1')
+
+    def test_rebuild_command(self):
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Про солнце')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+            cursor.execute(f'DELETE FROM {COMMENT_TABLE}')
+        self.assertEqual(self.search('погоду'), [])
+        self.assertEqual(self.search('солнце'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('погоду')), 1)
+        self.assertEqual(self.search('солнце'), [self.post])
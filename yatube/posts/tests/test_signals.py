@@ -0,0 +1,137 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import tasks
+from core.models import Task
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+from posts.search import search_posts
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+
+    def assertStats(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_post_counter(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Post.objects.create(text='Ещё текст', author=self.author)
+        self.assertStats(self.author, posts_count=2)
+        post.delete()
+        self.assertStats(self.author, posts_count=1)
+
+    def test_comment_counter(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Комментарий')
+        Comment.objects.create(post=post, author=self.user, text='Ещё')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_follow_counters(self):
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertStats(self.user, following_count=1, followers_count=0)
+        self.assertStats(self.author, following_count=0, followers_count=1)
+        follow.delete()
+        self.assertStats(self.user, following_count=0)
+        self.assertStats(self.author, followers_count=0)
+
+    def test_missing_stats_are_recreated(self):
+        Post.objects.create(text='Тестовый текст', author=self.author)
+        UserStats.objects.filter(user=self.author).delete()
+        Post.objects.create(text='Ещё текст', author=self.author)
+        self.assertStats(self.author, posts_count=2)
+
+    def test_rebuild_counters_command(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.all().delete()
+        Post.objects.update(comments_count=0)
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertStats(self.author, posts_count=1, followers_count=1)
+        self.assertStats(self.user, posts_count=0, following_count=1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+@override_settings(TASKS_EAGER=False)
+class QueuedSideEffectsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        tasks.run_batch()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_side_effects_wait_for_worker(self):
+        self.client.post(reverse('posts:post_create'),
+                         data={'text': 'Очередь задач'})
+        self.assertEqual(set(Task.objects.values_list('name', flat=True)),
+                         {'posts.index', 'posts.fan_out'})
+        self.assertEqual(search_posts('очередь').count(), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        # Счётчики входят в ключи кэша и меняются сразу
+        self.assertEqual(UserStats.objects.get(user=self.author).posts_count,
+                         1)
+        self.assertEqual(tasks.run_batch(), (2, 0))
+        self.assertEqual(search_posts('очередь').count(), 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=self.user).exists())
+
+    def test_repeated_edits_index_post_once(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        tasks.run_batch()
+        for i in range(3):
+            self.client.post(
+                reverse('posts:post_edit', args=[post.id]),
+                data={'text': f'Правка {i}'}
+            )
+        self.assertEqual(tasks.get_depth(), 1)
+        tasks.run_batch()
+        self.assertEqual(search_posts('правка').count(), 1)
+
+    def test_comment_indexes_only_itself(self):
+        post = Post.objects.create(text='Текст', author=self.author)
+        Comment.objects.create(post=post, author=self.user, text='Первый')
+        tasks.run_batch()
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Второй')
+        self.assertEqual(
+            list(Task.objects.values_list('name', 'args')),
+            [('posts.index_comment', f'[{comment.pk}]')]
+        )
+        tasks.run_batch()
+        self.assertEqual(search_posts('второй').count(), 1)
+        self.assertEqual(search_posts('первый').count(), 1)
+
+    def test_unfollow_skips_pending_backfill(self):
+        Post.objects.create(text='Текст', author=self.user)
+        Follow.objects.create(user=self.author, author=self.user)
+        Follow.objects.filter(user=self.author).delete()
+        tasks.run_batch()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.author).exists()
+        )
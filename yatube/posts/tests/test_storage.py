@@ -0,0 +1,132 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import ImageVariant, Post
+from posts.storage import HIDDEN_SUFFIX, image_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+SMALL_GIF_NAME = f'posts/{hashlib.sha256(SMALL_GIF).hexdigest()}.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@mock.patch('posts.thumbnails.schedule')
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches[sorl_settings.THUMBNAIL_CACHE].clear()
+        thumbnails.cache.cache.clear()
+
+    def create_post(self, name='small.gif', content=SMALL_GIF):
+        return Post.objects.create(
+            text='Тестовый текст',
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_same_bytes_are_stored_once(self, schedule):
+        first = self.create_post('first.gif')
+        _, files = image_storage.listdir('posts')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, SMALL_GIF_NAME)
+        self.assertEqual(second.image.name, SMALL_GIF_NAME)
+        self.assertEqual(image_storage.listdir('posts')[1], files)
+
+    def test_referenced_image_is_kept(self, schedule):
+        self.create_post()
+        self.assertFalse(thumbnails.release(SMALL_GIF_NAME))
+        self.assertTrue(image_storage.exists(SMALL_GIF_NAME))
+
+    def test_orphaned_image_is_deleted_with_variants(self, schedule):
+        post = self.create_post()
+        thumbnails.generate(post.image.name)
+        variants = list(ImageVariant.objects.values_list('name', flat=True))
+        with mock.patch('posts.thumbnails.release_on_commit') as release:
+            post.delete()
+        release.assert_called_once_with(SMALL_GIF_NAME)
+        self.make_old(SMALL_GIF_NAME)
+        self.assertTrue(thumbnails.release(SMALL_GIF_NAME))
+        self.assertFalse(image_storage.exists(SMALL_GIF_NAME))
+        self.assertFalse(ImageVariant.objects.exists())
+        for name in variants:
+            self.assertFalse(default_storage.exists(name))
+
+    def make_old(self, name):
+        # Загружен раньше, чем settings.POST_IMAGE_RELEASE_GRACE назад
+        os.utime(image_storage.path(name), (0, 0))
+
+    def delete_post(self, post):
+        with mock.patch('posts.thumbnails.release_on_commit'):
+            post.delete()
+
+    def test_image_uploaded_again_is_kept(self, schedule):
+        self.delete_post(self.create_post())
+        self.make_old(SMALL_GIF_NAME)
+        # Повторная загрузка нашла файл, а её пост ещё не сохранён
+        image_storage.save('posts/again.gif', BytesIO(SMALL_GIF))
+        self.assertFalse(thumbnails.release(SMALL_GIF_NAME))
+        self.assertTrue(image_storage.exists(SMALL_GIF_NAME))
+        self.assertFalse(os.path.exists(
+            image_storage.path(SMALL_GIF_NAME) + HIDDEN_SUFFIX
+        ))
+
+    def test_command_releases_orphans_after_grace(self, schedule):
+        kept = self.create_post()
+        orphan = self.create_post('other.gif', SMALL_GIF + b'\0').image.name
+        Post.objects.filter(image=orphan).delete()
+        self.make_old(kept.image.name)
+        self.make_old(orphan)
+        # Спрятанный файл, который release не успел вернуть
+        image_storage.hide(kept.image.name)
+        out = StringIO()
+        call_command('release_images', stdout=out)
+        self.assertIn('Удалено картинок: 1', out.getvalue())
+        self.assertTrue(image_storage.exists(kept.image.name))
+        self.assertFalse(image_storage.exists(orphan))
+
+    def test_replaced_image_is_released(self, schedule):
+        post = self.create_post()
+        post.image = SimpleUploadedFile('other.gif', SMALL_GIF + b'\0')
+        with mock.patch('posts.thumbnails.release_on_commit') as release:
+            post.save()
+        release.assert_called_once_with(SMALL_GIF_NAME)
+
+    def test_known_hash_is_not_thumbnailed_again(self, schedule):
+        post = self.create_post()
+        thumbnails.prepare(post.image.name)
+        with mock.patch('posts.thumbnails.generate') as generate:
+            self.assertEqual(thumbnails.prepare(self.create_post().image.name),
+                             SMALL_GIF_NAME)
+        generate.assert_not_called()
@@ -0,0 +1,91 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.conf import settings as sorl_settings
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+# Картинки ждут в очереди задач, а не готовятся сразу при сохранении
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, TASKS_EAGER=False)
+@mock.patch('posts.thumbnails.schedule')
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        caches[sorl_settings.THUMBNAIL_CACHE].clear()
+        thumbnails.cache.cache.clear()
+        self.client = Client()
+        self.address = reverse('posts:post_detail', args=[self.post.id])
+
+    def test_pending_image_falls_back_to_original(self, schedule):
+        self.assertIsNone(thumbnails.get_picture(self.post.image))
+        schedule.assert_called_with(self.post.image.name)
+        response = self.client.get(self.address)
+        self.assertContains(response, self.post.image.url)
+
+    def test_generated_variants_are_used(self, schedule):
+        formats = thumbnails.get_formats()
+        self.assertEqual(thumbnails.generate(self.post.image.name),
+                         len(formats) * len(settings.POST_IMAGE_WIDTHS))
+        picture = thumbnails.get_picture(self.post.image)
+        self.assertEqual((picture.width, picture.height), (960, 339))
+        self.assertEqual(len(picture.sources), len(formats) - 1)
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertIn(f' {width}w', picture.srcset)
+        response = self.client.get(self.address)
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f'src="{picture.src}"')
+        schedule.assert_not_called()
+
+    @override_settings(POST_IMAGE_FORMATS=('AVIF', 'JPEG'))
+    def test_unsupported_formats_are_skipped(self, schedule):
+        self.assertEqual(thumbnails.get_formats(), ['JPEG'])
+
+    def test_variant_sizes_are_read_without_opening_files(self, schedule):
+        thumbnails.generate(self.post.image.name)
+        thumbnails.get_picture(self.post.image)
+        with mock.patch('PIL.Image.open') as image_open:
+            with self.assertNumQueries(0):
+                picture = thumbnails.get_picture(self.post.image)
+        image_open.assert_not_called()
+        self.assertEqual(picture.height, 339)
+
+    def test_backfill_command(self, schedule):
+        call_command('backfill_thumbnails', workers=1, stdout=StringIO())
+        self.assertIsNotNone(thumbnails.get_picture(self.post.image))
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.timeline import rebuild, timeline_posts
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.other = User.objects.create_user(username='Other')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(TimelineTest.user)
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        Post.objects.create(text='Чужой пост', author=self.other)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user.id, post.id)]
+        )
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author]))
+        self.assertEqual(list(timeline_posts(self.user)), [post])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author]))
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    def test_follow_index_is_ordered_by_date(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=author)
+            for i, author in enumerate([self.author, self.other] * 3)
+        ]
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), posts[::-1])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_merged_on_read(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        celebrity_post = Post.objects.create(text='Тестовый текст',
+                                             author=self.author)
+        Follow.objects.create(user=self.user, author=self.other)
+        post = Post.objects.create(text='Пост', author=self.other)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=celebrity_post).exists())
+        self.assertEqual(list(timeline_posts(self.user)),
+                         [post, celebrity_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_former_celebrity_posts_stay_in_feeds(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        follow = Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        self.assertEqual(list(timeline_posts(self.user)), [post])
+        follow.delete()
+        self.assertEqual(list(timeline_posts(self.user)), [post])
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_rebuild(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Тестовый текст', author=self.author)
+        TimelineEntry.objects.all().delete()
+        rebuild()
+        self.assertEqual(list(timeline_posts(self.user)), [post])
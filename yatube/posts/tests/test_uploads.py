@@ -0,0 +1,124 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post
+from posts.storage import image_storage
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+# Тег Orientation = 6: картинку нужно повернуть на 90°
+ORIENTATION = 0x0112
+
+
+def make_image(image_format, size=(4, 2), **params):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self, name, content):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name, content),
+            },
+        )
+
+    def test_create_post_stores_image(self):
+        response = self.create_post('small.gif', SMALL_GIF)
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[self.user.username])
+        )
+        post = Post.objects.get(author=self.user)
+        self.assertTrue(post.image.name.startswith('posts/'))
+        self.assertTrue(image_storage.exists(post.image.name))
+
+    @override_settings(POST_IMAGE_MAX_SIZE=16)
+    def test_too_large_file_is_rejected(self):
+        response = self.create_post('small.gif', SMALL_GIF)
+        self.assertFormError(
+            response, 'form', 'image', 'Файл больше 16\xa0байт.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=1)
+    def test_too_many_pixels_are_rejected(self):
+        response = self.create_post('small.gif', SMALL_GIF)
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0 мегапикселей.'
+        )
+
+    def test_unsupported_format_is_rejected(self):
+        response = self.create_post('small.bmp', make_image('BMP'))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Поддерживаются только JPEG, PNG, GIF и WebP.'
+        )
+
+    def test_sanitize_strips_exif_and_applies_orientation(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        name = image_storage.save(
+            'posts/rotated.jpg',
+            BytesIO(make_image('JPEG', exif=exif.tobytes()))
+        )
+        clean_name = uploads.sanitize(name)
+        self.assertNotEqual(clean_name, name)
+        with image_storage.open(clean_name) as f:
+            image = Image.open(f)
+            self.assertEqual(image.size, (2, 4))
+            self.assertNotIn('exif', image.info)
+
+    def test_post_keeps_only_sanitized_image(self):
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        content = make_image('JPEG', exif=exif.tobytes())
+        raw_name = image_storage.hashed_name(
+            'posts/rotated.jpg', SimpleUploadedFile('rotated.jpg', content)
+        )
+        self.create_post('rotated.jpg', content)
+        post = Post.objects.get(author=self.user)
+        self.assertNotEqual(post.image.name, raw_name)
+        self.assertTrue(image_storage.exists(post.image.name))
+        self.assertFalse(image_storage.exists(raw_name))
+
+    def test_sanitize_keeps_gif(self):
+        name = image_storage.save('posts/keep.gif', BytesIO(SMALL_GIF))
+        self.assertEqual(uploads.sanitize(name), name)
+        with image_storage.open(name) as f:
+            self.assertEqual(f.read(), SMALL_GIF)
@@ -3,6 +3,7 @@ from http import HTTPStatus
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 
+from posts.cache import cache
 from posts.models import Group, Post
 
 User = get_user_model()
@@ -25,6 +26,7 @@ class PostURLTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.user = PostURLTests.user
         self.authorized_client = Client()
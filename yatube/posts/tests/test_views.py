@@ -1,13 +1,17 @@
+import time
 from itertools import islice
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from posts.cache import cache, get_stats
+from posts.models import Comment, Follow, Group, Post
 
 User = get_user_model()
 
@@ -37,6 +41,7 @@ class ViewsTests(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.user = ViewsTests.user
         self.user_not_follow = ViewsTests.user_not_follow
         self.authorized_client = Client()
@@ -132,13 +137,56 @@ class ViewsTests(TestCase):
         self.assertEqual(response.context.get('post').id, self.post.id)
 
     def test_cache(self):
-        response_not_del = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.all().delete()
-        response_del = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_not_del.content, response_del.content)
+        response_cached = self.authorized_client.get(reverse('posts:index'))
+        Post.objects.all().update(text='Изменено в обход сигналов')
+        response_stale = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(response_cached.content, response_stale.content)
         cache.clear()
         response_clear = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response_del.content, response_clear.content)
+        self.assertNotEqual(response_stale.content, response_clear.content)
+
+    def test_cache_is_invalidated_on_post_changes(self):
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for address in addresses:
+            self.authorized_client.get(address)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный текст'
+        post.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertContains(response, 'Отредактированный текст')
+        Post.objects.all().delete()
+        for address in addresses[:2]:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertNotContains(response, 'Отредактированный текст')
+
+    @override_settings(FEED_CACHE_TIMEOUT=20, FEED_VERSION_TIMEOUT=20)
+    def test_unshared_cache_expires_with_versions(self):
+        address = reverse('posts:index')
+        response = self.authorized_client.get(address)
+        # Пост сохранён другим воркером: его сдвиг поколений здесь не виден
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Изменено другим воркером', version=self.post.version + 1
+        )
+        later = time.time() + settings.PAGE_CACHE_TIMEOUT + 20
+        with mock.patch('time.time', return_value=later):
+            response = self.authorized_client.get(
+                address, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertContains(response, 'Изменено другим воркером')
+
+    def test_cache_stats(self):
+        cache.clear()
+        # Разные адреса, чтобы не попасть в кэш целой страницы
+        self.authorized_client.get(reverse('posts:index'))
+        self.authorized_client.get(reverse('posts:index') + '?page=1')
+        self.assertEqual(get_stats(), {'hits': 1, 'misses': 1})
 
     def test_follow(self):
         follow_count = Follow.objects.count()
@@ -265,3 +313,428 @@ class PaginatorViewsTest(TestCase):
             total_pages = self.batch_size // settings.ITEMS_COUNT
             response = self.authorized_client.get(address + '?page=2')
             self.assertEqual(len(response.context['page_obj']), total_pages)
+
+
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(group=cls.group, author=cls.user, text='Test %s' % i)
+            for i in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CursorPaginatorViewsTest.user)
+        self.application_addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': f'{self.group.slug}'}),
+            reverse('posts:profile', kwargs={'username': f'{self.user}'}),
+        ]
+
+    def test_cursor_pages_walk_whole_feed(self):
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('id', flat=True))
+        for address in self.application_addresses:
+            with self.subTest(address=address):
+                seen = []
+                cursor = ''
+                while cursor is not None:
+                    response = self.authorized_client.get(
+                        address, {'cursor': cursor})
+                    page_obj = response.context['page_obj']
+                    seen.extend(post.id for post in page_obj)
+                    cursor = page_obj.next_cursor
+                self.assertEqual(seen, expected)
+
+    def test_cursor_previous_page(self):
+        address = reverse('posts:index')
+        first = self.authorized_client.get(address, {'cursor': ''})
+        second = self.authorized_client.get(
+            address, {'cursor': first.context['page_obj'].next_cursor})
+        back = self.authorized_client.get(
+            address, {'cursor': second.context['page_obj'].previous_cursor})
+        self.assertEqual(
+            [post.id for post in back.context['page_obj']],
+            [post.id for post in first.context['page_obj']]
+        )
+        self.assertFalse(back.context['page_obj'].has_previous())
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.ITEMS_COUNT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(12):
+            author = User.objects.create_user(username=f'author_{i}')
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(text=f'Пост {i}', author=author,
+                                group=cls.group)
+            Post.objects.create(text=f'Пост автора {i}', author=cls.author,
+                                group=cls.group)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedQueriesTest.user)
+        self.feed_addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        ]
+
+    def count_queries(self, address, page_size):
+        cache.clear()
+        with self.settings(ITEMS_COUNT=page_size):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(address)
+        self.assertEqual(len(response.context['page_obj']), page_size)
+        return len(queries)
+
+    def test_feed_query_count_does_not_depend_on_page_size(self):
+        for address in self.feed_addresses:
+            with self.subTest(address=address):
+                self.assertEqual(self.count_queries(address, 1),
+                                 self.count_queries(address, 10))
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='Yaroslav')
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ConditionalGetTest.user)
+        self.addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+
+    def revalidate(self, client, address, response):
+        return client.get(
+            address,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+
+    def test_unchanged_pages_return_not_modified(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertEqual(response.status_code, 200)
+                response = self.revalidate(
+                    self.guest_client, address, response
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_post_changes_invalidate_validators(self):
+        responses = {
+            address: self.guest_client.get(address)
+            for address in self.addresses
+        }
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        for address, response in responses.items():
+            with self.subTest(address=address):
+                response = self.revalidate(
+                    self.guest_client, address, response
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_group_and_author_changes_invalidate_validators(self):
+        changes = [
+            (self.group, 'description', 'Новое описание', self.addresses[1]),
+            (self.group, 'title', 'Новая группа', self.addresses[3]),
+            (self.author, 'first_name', 'Ярослав', self.addresses[2]),
+            (self.author, 'last_name', 'Мудрый', self.addresses[3]),
+        ]
+        for instance, field, value, address in changes:
+            with self.subTest(field=field, address=address):
+                response = self.guest_client.get(address)
+                setattr(instance, field, value)
+                instance.save()
+                response = self.revalidate(
+                    self.guest_client, address, response
+                )
+                self.assertContains(response, value)
+
+    def test_commenter_rename_invalidates_post_detail(self):
+        commenter = User.objects.create_user(username='Commenter')
+        Comment.objects.create(post=self.post, author=commenter,
+                               text='Комментарий')
+        address = self.addresses[-1]
+        response = self.guest_client.get(address)
+        commenter.username = 'Renamed'
+        commenter.save()
+        response = self.revalidate(self.guest_client, address, response)
+        self.assertContains(response, 'Renamed')
+
+    def test_login_keeps_validators(self):
+        address = self.addresses[2]
+        response = self.guest_client.get(address)
+        # Так вход сохраняет пользователя
+        self.author.save(update_fields=['last_login'])
+        response = self.revalidate(self.guest_client, address, response)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_comment_invalidates_post_detail(self):
+        address = self.addresses[-1]
+        response = self.guest_client.get(address)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий'},
+        )
+        response = self.revalidate(self.guest_client, address, response)
+        self.assertContains(response, 'Комментарий')
+
+    def test_validators_depend_on_user(self):
+        for address in self.addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                response = self.revalidate(
+                    self.authorized_client, address, response
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_follow_invalidates_profile(self):
+        address = self.addresses[2]
+        response = self.authorized_client.get(address)
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.revalidate(self.authorized_client, address, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
+
+    def test_profile_checks_follow_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(self.addresses[2])
+        self.assertEqual(
+            len([query for query in queries
+                 if 'posts_follow' in query['sql']]),
+            1
+        )
+
+    def test_missing_pages_are_not_found(self):
+        addresses = [
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 404}),
+        ]
+        for address in addresses:
+            with self.subTest(address=address):
+                response = self.guest_client.get(address)
+                self.assertEqual(response.status_code, 404)
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.follower = User.objects.create_user(username='Follower')
+        cls.post = Post.objects.create(
+            text='Тестовый текст',
+            author=cls.author,
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(PageCacheTest.author)
+        self.follower_client = Client()
+        self.follower_client.force_login(PageCacheTest.follower)
+        self.post_address = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+        self.profile_address = reverse(
+            'posts:profile', kwargs={'username': self.author}
+        )
+
+    def test_page_is_rendered_once_for_all_users(self):
+        response = self.guest_client.get(self.post_address)
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+        for client in (self.guest_client, self.author_client):
+            with self.subTest(client=client):
+                response = client.get(self.post_address)
+                self.assertTemplateNotUsed(response, 'posts/post_detail.html')
+                self.assertContains(response, 'Тестовый текст')
+                self.assertNotContains(response, '<!--hole:')
+
+    def test_holes_are_filled_per_user(self):
+        self.guest_client.get(self.post_address)
+        guest = self.guest_client.get(self.post_address)
+        author = self.author_client.get(self.post_address)
+        self.assertContains(guest, 'Войти')
+        self.assertNotContains(guest, 'редактировать запись')
+        self.assertNotContains(guest, 'csrfmiddlewaretoken')
+        self.assertContains(author, f'Пользователь: {self.author.username}')
+        self.assertContains(author, 'редактировать запись')
+        self.assertContains(author, 'csrfmiddlewaretoken')
+        self.assertIn('csrftoken', author.cookies)
+
+    def test_follow_button_is_personal(self):
+        self.author_client.get(self.profile_address)
+        response = self.follower_client.get(self.profile_address)
+        self.assertTemplateNotUsed(response, 'posts/profile.html')
+        self.assertContains(response, 'Отписаться')
+        response = self.author_client.get(self.profile_address)
+        self.assertContains(response, 'Подписаться')
+
+    def test_group_and_author_changes_reach_cached_pages(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Старое описание'
+        )
+        Post.objects.create(text='Текст в группе', author=self.author,
+                            group=group)
+        addresses = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': group.slug}),
+            self.profile_address,
+            self.post_address,
+        ]
+        for address in addresses:
+            self.guest_client.get(address)
+        group.description = 'Новое описание'
+        group.save()
+        self.author.first_name = 'Ярослав'
+        self.author.save()
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertContains(self.guest_client.get(address),
+                                    'Ярослав')
+        self.assertContains(self.guest_client.get(addresses[1]),
+                            'Новое описание')
+
+    def test_group_slug_change_reaches_feeds(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(text='Текст в группе', author=self.follower,
+                            group=group)
+        address = reverse('posts:index')
+        self.guest_client.get(address)
+        group.slug = 'renamed'
+        group.save()
+        self.assertContains(self.guest_client.get(address), '/group/renamed/')
+
+    def test_group_deletion_reaches_feeds(self):
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(text='Текст в группе', author=self.author,
+                            group=group)
+        addresses = [reverse('posts:index'), self.profile_address]
+        for address in addresses:
+            self.assertContains(self.guest_client.get(address),
+                                '/group/group/')
+        group.delete()
+        for address in addresses:
+            with self.subTest(address=address):
+                self.assertNotContains(self.guest_client.get(address),
+                                       '/group/group/')
+
+    def test_changed_page_is_rendered_again(self):
+        self.guest_client.get(self.post_address)
+        Post.objects.get(pk=self.post.pk).save()
+        response = self.guest_client.get(self.post_address)
+        self.assertTemplateUsed(response, 'posts/post_detail.html')
+
+
+@override_settings(COMMENTS_COUNT=2)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.author = User.objects.create_user(username='AvTor')
+        cls.post = Post.objects.create(text='Тестовый текст',
+                                       author=cls.author)
+        for i in range(3):
+            commenter = User.objects.create_user(username=f'commenter_{i}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.address = reverse('posts:post_detail', args=[self.post.id])
+
+    def test_post_detail_shows_first_comments(self):
+        response = self.client.get(self.address)
+        comments = response.context['comments']
+        self.assertEqual([comment.text for comment in comments],
+                         ['Комментарий 0', 'Комментарий 1'])
+        self.assertContains(response, 'Показать ещё')
+        response = self.client.get(
+            self.address, {'comments': comments.next_cursor}
+        )
+        self.assertContains(response, 'Комментарий 2')
+        self.assertNotContains(response, 'Комментарий 0')
+
+    def test_comments_fragment(self):
+        first = self.client.get(self.address).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.id]),
+            {'cursor': first.next_cursor}
+        )
+        data = response.json()
+        self.assertIn('commenter_2', data['html'])
+        self.assertNotIn('commenter_1', data['html'])
+        self.assertIsNone(data['next_cursor'])
+
+    def test_comment_authors_are_joined(self):
+        address = reverse('posts:post_comments', args=[self.post.id])
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(address)
+        with self.settings(COMMENTS_COUNT=3):
+            with CaptureQueriesContext(connection) as many:
+                self.client.get(address)
+        self.assertEqual(len(few), len(many))
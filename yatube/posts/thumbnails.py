@@ -0,0 +1,247 @@
+"""Фоновая подготовка адаптивных вариантов картинок постов.
+
+После сохранения поста с картинкой задача очереди (posts.tasks) рендерит
+её через sorl-thumbnail во всех ширинах settings.POST_IMAGE_WIDTHS
+и форматах settings.POST_IMAGE_FORMATS, которые умеет Pillow; картинки без
+вариантов, найденные при показе, дорендеривает пул потоков. Размеры
+вариантов сохраняются в ImageVariant и кэшируются одним списком на
+картинку, так что шаблон собирает <picture> со srcset, ни разу не открывая
+файл. Пока варианты готовятся, показывается исходная картинка. Имена
+картинок — хеши содержимого (posts.storage), поэтому повторная загрузка тех
+же байтов не рендерится заново, а файл без ссылок из постов удаляется
+вместе с вариантами (release).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from PIL import Image
+from sorl.thumbnail import delete as delete_thumbnails
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+
+from core.metrics import THUMBNAIL_DURATION
+
+from . import cache, uploads
+from .models import ImageVariant, Post
+from .storage import image_storage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_KEY = 'image:{name}:variants'
+FALLBACK_FORMAT = 'JPEG'
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def get_formats():
+    """Форматы из настроек, для которых есть кодировщик Pillow и sorl"""
+    Image.init()
+    formats = [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE and image_format in EXTENSIONS
+    ]
+    if FALLBACK_FORMAT not in formats:
+        formats.append(FALLBACK_FORMAT)
+    return formats
+
+
+def get_geometry(width):
+    ratio_width, ratio_height = settings.POST_IMAGE_ASPECT
+    return f'{width}x{round(width * ratio_height / ratio_width)}'
+
+
+class Picture:
+    """Варианты одной картинки, сгруппированные для тега <picture>"""
+
+    def __init__(self, variants):
+        by_format = {}
+        for variant in sorted(variants, key=lambda item: item['width']):
+            by_format.setdefault(variant['format'], []).append(variant)
+        fallback = by_format.pop(FALLBACK_FORMAT)
+        self.sources = [
+            {
+                'type': Image.MIME[image_format],
+                'srcset': join_srcset(by_format[image_format]),
+            }
+            for image_format in get_formats() if image_format in by_format
+        ]
+        self.srcset = join_srcset(fallback)
+        default_width = settings.POST_IMAGE_ASPECT[0]
+        img = min(
+            fallback, key=lambda item: abs(item['width'] - default_width)
+        )
+        self.src = img['url']
+        self.width = img['width']
+        self.height = img['height']
+
+
+def join_srcset(variants):
+    return ', '.join(
+        f'{variant["url"]} {variant["width"]}w' for variant in variants
+    )
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POST_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+        return _executor
+
+
+def get_manifest(name):
+    """Список вариантов картинки из кэша, а при промахе — из базы"""
+    key = MANIFEST_KEY.format(name=name)
+    manifest = cache.cache.get(key)
+    if manifest is None:
+        manifest = [
+            {
+                'url': default_storage.url(variant.name),
+                'format': variant.format,
+                'width': variant.width,
+                'height': variant.height,
+            }
+            for variant in ImageVariant.objects.filter(source=name)
+        ]
+        if manifest:
+            cache.cache.set(key, manifest, None)
+    return manifest
+
+
+def generate(name):
+    """Рендерит все варианты картинки; возвращает их число"""
+    started = time.perf_counter()
+    variants = []
+    for image_format in get_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            thumbnail = get_thumbnail(
+                name, get_geometry(width),
+                crop='center', upscale=True, format=image_format
+            )
+            variants.append(ImageVariant(
+                source=name,
+                name=thumbnail.name,
+                format=image_format,
+                width=thumbnail.width,
+                height=thumbnail.height,
+            ))
+    with transaction.atomic():
+        ImageVariant.objects.filter(source=name).delete()
+        ImageVariant.objects.bulk_create(variants)
+    cache.cache.delete(MANIFEST_KEY.format(name=name))
+    THUMBNAIL_DURATION.observe(time.perf_counter() - started)
+    return len(variants)
+
+
+def release(name, grace=None):
+    """Удаляет картинку и её варианты, если на неё не ссылается ни один пост.
+
+    Ссылки считаются запросом к базе, поэтому отдельный счётчик не нужен.
+    Загрузка тех же байтов могла найти файл и ещё не сохранить свой пост:
+    файл, который загружали в последние grace секунд (по умолчанию
+    settings.POST_IMAGE_RELEASE_GRACE), остаётся, его потом удалит
+    manage.py release_images.
+    """
+    if grace is None:
+        grace = settings.POST_IMAGE_RELEASE_GRACE
+    if not name or Post.objects.filter(image=name).exists():
+        return False
+    # Сначала прячем файл: загрузка после этого запишет его заново, а та,
+    # что успела его найти, видна по mtime
+    hidden = image_storage.hide(name)
+    if hidden is not None and (
+        image_storage.touched_within(hidden, grace)
+        or Post.objects.filter(image=name).exists()
+    ):
+        image_storage.unhide(name, hidden)
+        return False
+    variants = ImageVariant.objects.filter(source=name)
+    for variant_name in variants.values_list('name', flat=True):
+        default_storage.delete(variant_name)
+    variants.delete()
+    cache.cache.delete(MANIFEST_KEY.format(name=name))
+    # Миниатюры, которые sorl строил в обход ImageVariant
+    delete_thumbnails(name, delete_file=False)
+    if hidden is not None:
+        # Файл мог уже убрать release_images
+        with suppress(FileNotFoundError):
+            os.remove(hidden)
+    return True
+
+
+def release_on_commit(name):
+    transaction.on_commit(lambda: release(name))
+
+
+def prepare(name, sanitize=False):
+    """Готовит картинку к показу; возвращает её итоговое имя"""
+    if sanitize:
+        clean_name = uploads.sanitize(name)
+        if clean_name != name:
+            Post.objects.filter(image=name).update(image=clean_name)
+            # Исходник с EXIF только что загружен и всегда моложе grace, но
+            # ждать нельзя: его адрес уже попал в страницы
+            release(name, grace=0)
+            name = clean_name
+    # Те же байты уже загружались: варианты готовы
+    if not ImageVariant.objects.filter(source=name).exists():
+        generate(name)
+    return name
+
+
+def publish(source, sanitize=False):
+    """Готовит картинку и сбрасывает кэши постов, где она показана"""
+    name = prepare(source, sanitize)
+    # Фрагменты постов и лент могли закэшировать заглушку вместо вариантов
+    posts = Post.objects.filter(image=name)
+    posts.update(version=F('version') + 1)
+    for post in posts:
+        cache.bump_versions(cache.post_scopes(post))
+    return name
+
+
+def _generate_in_background(source, sanitize):
+    try:
+        publish(source, sanitize)
+    except Exception:
+        logger.exception('Не удалось подготовить варианты для %s', source)
+    finally:
+        with _lock:
+            _pending.discard(source)
+        connections.close_all()
+
+
+def schedule(name, sanitize=False):
+    """Ставит картинку в очередь пула, если она ещё не в работе.
+
+    С sanitize=True новая загрузка сперва перекодируется без EXIF.
+    """
+    with _lock:
+        if not name or name in _pending:
+            return
+        _pending.add(name)
+    get_executor().submit(_generate_in_background, name, sanitize)
+
+
+def get_picture(file_):
+    """Готовые варианты картинки или None, если они ещё в очереди"""
+    if not file_:
+        return None
+    manifest = get_manifest(file_.name)
+    if not any(item['format'] == FALLBACK_FORMAT for item in manifest):
+        schedule(file_.name)
+        return None
+    return Picture(manifest)
@@ -0,0 +1,98 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост автора сразу раскладывается в TimelineEntry каждого подписчика,
+поэтому лента подписок читается одним диапазонным сканированием индекса
+(user, -pub_date). Авторы, у которых подписчиков не меньше
+settings.TIMELINE_FANOUT_LIMIT, не раскладываются: их посты подмешиваются
+в ленту при чтении, а когда автор опускается ниже порога, его посты
+раскладываются по лентам всех подписчиков (backfill_followers).
+"""
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора"""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post.pk,
+                       pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя посты нового избранного автора"""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_followers(author_id):
+    """Добавляет посты автора в ленты всех его подписчиков"""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты пользователя посты автора, от которого он отписался"""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты пользователей (по умолчанию всех) с нуля"""
+    follows = Follow.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        TimelineEntry.objects.filter(user_id__in=user_ids).delete()
+    else:
+        TimelineEntry.objects.all().delete()
+    for user_id, author_id in follows.values_list('user_id', 'author_id'):
+        backfill(user_id, author_id)
+
+
+def timeline_posts(user):
+    """Посты ленты подписок пользователя, новые сверху"""
+    celebrities = Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True)
+    posts = Post.objects.for_feed()
+    if not celebrities.exists():
+        return posts.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date', '-timeline_entries__post'
+        )
+    entries = TimelineEntry.objects.filter(user=user).values('post')
+    return posts.filter(
+        Q(pk__in=entries) | Q(author__in=celebrities)
+    ).order_by('-pub_date', '-pk')
@@ -0,0 +1,101 @@
+"""Приём картинок постов без декодирования в потоке запроса.
+
+Загрузка всегда пишется во временный файл и обрезается на
+settings.POST_IMAGE_MAX_SIZE, форма проверяет только заголовок картинки,
+а перекодирование без EXIF выполняет пул posts.thumbnails уже после ответа.
+"""
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+from .storage import image_storage
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Форматы, которые перекодируются ради удаления метаданных;
+# GIF не трогаем, чтобы не потерять анимацию
+REENCODED_FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку во временный файл, но не больше лимита на диск.
+
+    Остаток файла отбрасывается, а полный размер сохраняется в file.size,
+    чтобы форма вернула понятную ошибку вместо обрезанной картинки.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        limit = settings.POST_IMAGE_MAX_SIZE
+        if start < limit:
+            self.file.write(raw_data[:limit - start])
+
+
+class StreamedImageField(forms.ImageField):
+    """Картинка, проверенная по заголовку без полного декодирования"""
+    default_error_messages = {
+        'too_large': 'Файл больше %(limit)s.',
+        'too_many_pixels': 'Картинка больше %(limit)s мегапикселей.',
+        'unsupported_format': 'Поддерживаются только JPEG, PNG, GIF и WebP.',
+    }
+
+    def to_python(self, data):
+        f = forms.FileField.to_python(self, data)
+        if f is None:
+            return None
+        if f.size > settings.POST_IMAGE_MAX_SIZE:
+            raise ValidationError(
+                self.error_messages['too_large'],
+                code='too_large',
+                params={'limit': filesizeformat(settings.POST_IMAGE_MAX_SIZE)},
+            )
+        try:
+            # open() читает только заголовок: формат и размеры
+            image = Image.open(f)
+        except Exception as exc:
+            raise ValidationError(
+                self.error_messages['invalid_image'], code='invalid_image',
+            ) from exc
+        if image.format not in ALLOWED_FORMATS:
+            raise ValidationError(
+                self.error_messages['unsupported_format'],
+                code='unsupported_format',
+            )
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                self.error_messages['too_many_pixels'],
+                code='too_many_pixels',
+                params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+            )
+        f.image = image
+        f.content_type = Image.MIME.get(image.format)
+        f.seek(0)
+        return f
+
+
+def sanitize(name):
+    """Перекодирует картинку: поворот по EXIF, без метаданных.
+
+    Хранилище адресуется содержимым, поэтому результат ложится в новый
+    файл; возвращается его имя или исходное, если формат не перекодируется.
+    """
+    with image_storage.open(name, 'rb') as source:
+        image = Image.open(source)
+        image_format = image.format
+        if image_format not in REENCODED_FORMATS:
+            return name
+        icc_profile = image.info.get('icc_profile')
+        image = ImageOps.exif_transpose(image)
+        image.load()
+        image.info.pop('exif', None)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, format=image_format, quality=90, optimize=True,
+               icc_profile=icc_profile)
+    return image_storage.save(name, ContentFile(buffer.getvalue()))
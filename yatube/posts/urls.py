@@ -13,8 +13,16 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
+    # Поиск
+    path('search/', views.search, name='search'),
     # Просмотр поста
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    # Порция комментариев поста
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Создание поста
     path('create/', views.post_create, name='post_create'),
     # Редактирование поста
@@ -1,73 +1,155 @@
+from urllib.parse import urlencode
+
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import QuerySet
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 
+from .cache import author_scope, group_scope, index_scope
+from .conditional import (cached_page, following_state, group_state,
+                          index_state, post_state, profile_state)
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .search import search_posts
+from .timeline import timeline_posts
+
+
+def get_comments_page(post, cursor):
+    """Комментарии поста по курсору, авторы подгружаются тем же запросом"""
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_COUNT,
+        ordering=('created', 'id')
+    )
+    return paginator.get_page(cursor)
 
 
 def get_page_context(queryset, request):
-    """Пагинация страниц"""
-    paginator = Paginator(queryset, settings.ITEMS_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    """Пагинация страниц.
+
+    С параметром ?cursor= включается курсорная пагинация по (pub_date, id),
+    время ответа которой не растёт с глубиной страницы.
+    """
+    if 'cursor' in request.GET and isinstance(queryset, QuerySet):
+        paginator = CursorPaginator(queryset, settings.ITEMS_COUNT)
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(queryset, settings.ITEMS_COUNT)
+        page_obj = paginator.get_page(request.GET.get('page'))
     return {
         'page_obj': page_obj,
     }
 
 
+def get_feed_context(queryset, request):
+    """Пагинация ленты, собираемой из кэша фрагментов постов.
+
+    Страница загружает только id, версии и даты постов: по ним
+    {% post_fragments %} достаёт готовый HTML одним get_many и дозагружает
+    одним запросом лишь посты без фрагмента.
+    """
+    # Внешние ключи нужны, чтобы менеджеры group.posts и author.posts
+    # не догружали их по одному на пост
+    queryset = queryset.select_related(None).only(
+        'id', 'version', 'pub_date', 'author', 'group'
+    )
+    return get_page_context(queryset, request)
+
+
+@cached_page(index_state)
 def index(request):
     """Главная страница"""
-    context = get_page_context(Post.objects.all(), request)
+    context = {
+        'feed_scope': index_scope(),
+    }
+    context.update(get_feed_context(Post.objects.for_feed(), request))
     return render(request, 'posts/index.html', context)
 
 
+@cached_page(group_state)
 def group_posts(request, slug):
     """Страница сообщества"""
     group = get_object_or_404(Group, slug=slug)
     context = {
         'group': group,
+        'feed_scope': group_scope(group.pk),
     }
-    context.update(get_page_context(group.posts.all(), request))
+    context.update(get_feed_context(group.posts.for_feed(), request))
     return render(request, 'posts/group_list.html', context)
 
 
+@cached_page(profile_state, following_state)
 def profile(request, username):
     """Страница пользователя"""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author
-    ).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.for_feed()
+    # Подписку уже проверил ETag, повторный запрос не нужен
+    following = following_state(request, username)
     profile = author
     context = {
         'author': author,
         'posts': posts,
         'following': following,
         'profile': profile,
+        'feed_scope': author_scope(author.pk),
     }
-    context.update(get_page_context(posts, request))
+    context.update(get_feed_context(posts, request))
     return render(request, 'posts/profile.html', context)
 
 
+def search(request):
+    """Поиск по постам и комментариям"""
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    context.update(get_page_context(search_posts(query), request))
+    return render(request, 'posts/search.html', context)
+
+
+@cached_page(post_state)
 def post_detail(request, post_id):
     """Страница с определенным постом"""
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': get_comments_page(post, request.GET.get('comments')),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста фрагментом HTML в JSON"""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = get_comments_page(post, request.GET.get('cursor'))
+    html = render_to_string(
+        'includes/comment_list.html',
+        {'comments': comments, 'post_id': post.id},
+        request=request
+    )
+    return JsonResponse({
+        'html': html,
+        'next_cursor': comments.next_cursor,
+    })
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     """Страница создания записи"""
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
@@ -77,6 +159,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     """Страница редактирования записи"""
     post = get_object_or_404(Post, pk=post_id)
@@ -100,6 +183,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     """Обработка отправленного комментария"""
     post = get_object_or_404(Post, id=post_id)
@@ -114,12 +198,12 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    context = get_page_context(posts, request)
+    context = get_feed_context(timeline_posts(request.user), request)
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
     author = get_object_or_404(User, username=username)
@@ -132,6 +216,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=request.user, author=author)
@@ -25,12 +25,59 @@ SECRET_KEY = 'f!94n*1_i0)m8mpdd2ypogr^*$jlb^y%9ul56@i3p@9n^_!a9&'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
-CACHES = {
-    'default': {
+# Бэкенд кэша выбирается переменной окружения YATUBE_CACHE:
+# locmem — свой кэш у каждого процесса (по умолчанию, для разработки),
+# sqlite — общий для всех воркеров файл SQLite (core.cache.backends),
+# file — общий каталог с файлами кэша Django.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'locmem')
+CACHE_DIR = os.environ.get(
+    'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+)
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'sqlite': {
+        'BACKEND': 'core.cache.backends.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+
+def cache_config(namespace):
+    """Алиас кэша приложения: свой префикс ключей и своя очистка"""
+    config = dict(CACHE_BACKENDS[CACHE_BACKEND])
+    config['KEY_PREFIX'] = f'yatube:{namespace}'
+    if CACHE_BACKEND == 'locmem':
+        config['LOCATION'] = namespace
+    elif CACHE_BACKEND == 'file':
+        config['LOCATION'] = os.path.join(config['LOCATION'], namespace)
+    return config
+
+
+CACHES = {
+    namespace: cache_config(namespace)
+    for namespace in ('default', 'posts', 'users', 'about')
+}
+# Фрагменты лент и страницы сбрасываются сдвигом поколений в кэше
+# (posts.cache). Общий бэкенд видят все воркеры, и кэш живёт час; в locmem
+# сдвиг видит только процесс, записавший пост, поэтому остальные отдают
+# старое до истечения короткого TTL, а поколения устаревают вместе с ним
+SHARED_CACHE = CACHE_BACKEND != 'locmem'
+FEED_CACHE_TIMEOUT = 60 * 60 if SHARED_CACHE else 20
+FEED_VERSION_TIMEOUT = None if SHARED_CACHE else FEED_CACHE_TIMEOUT
+# Отдельные посты в лентах (posts.fragments); ключ содержит версию поста
+POST_FRAGMENT_TIMEOUT = 60 * 60 * 24
+# Целые страницы с дырками под персональные фрагменты (core.holes);
+# страницы постов сбрасываются по их состоянию, about живёт до TTL
+PAGE_CACHE_TIMEOUT = FEED_CACHE_TIMEOUT
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -56,7 +103,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ConnectionCountMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Раньше сессий, чтобы их сохранение тоже закрепляло клиента за основной
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,6 +121,51 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 ITEMS_COUNT: int = 10
+COMMENTS_COUNT: int = 50
+# Варианты картинок постов готовятся в фоне (posts.thumbnails): все ширины
+# во всех форматах из списка, которые поддерживает Pillow, в порядке
+# предпочтения; JPEG добавляется всегда как запасной
+POST_IMAGE_ASPECT = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+POST_IMAGE_FORMATS = ('WEBP', 'JPEG')
+POST_THUMBNAIL_WORKERS: int = 2
+# Картинку без постов, которую загружали за это время, release не удаляет:
+# пост с повторной загрузкой может быть ещё не сохранён. Такие файлы
+# удаляет manage.py release_images (по cron)
+POST_IMAGE_RELEASE_GRACE: int = 10 * 60
+# Загрузки всегда пишутся во временный файл и обрезаются на лимите,
+# картинка проверяется по заголовку (posts.uploads)
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedTemporaryFileUploadHandler']
+POST_IMAGE_MAX_SIZE: int = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS: int = 40 * 10 ** 6
+# Авторы с таким числом подписчиков не раскладываются по лентам при записи,
+# их посты подмешиваются в ленту подписок при чтении
+TIMELINE_FANOUT_LIMIT: int = 10000
+# Метрики Prometheus (core.metrics, /metrics) копятся в файле SQLite,
+# общем для всех процессов; пустое значение отключает запись (так
+# работают тесты, core.test_runner)
+METRICS_DB = os.getenv(
+    'YATUBE_METRICS_DB', os.path.join(CACHE_DIR, 'metrics.sqlite3')
+)
+# Сколько секунд запрос ждёт занятый файл метрик, прежде чем их потерять
+METRICS_TIMEOUT = 1
+TEST_RUNNER = 'core.test_runner.TestRunner'
+# Выборочное профилирование запросов (core.profiling): доля профилируемых
+# запросов и число последних замеров вью, по которым считаются перцентили
+PROFILING_SAMPLE_RATE = float(
+    os.getenv('YATUBE_PROFILING_SAMPLE_RATE', 0.01)
+)
+PROFILING_WINDOW = 500
+# Очередь фоновых задач (core.tasks): в бою их выполняет manage.py
+# run_tasks, а с DEBUG и в тестах они выполняются сразу при постановке
+TASKS_EAGER = bool(int(os.getenv('YATUBE_TASKS_EAGER', DEBUG)))
+TASKS_BATCH_SIZE = 100
+TASKS_MAX_ATTEMPTS = 5
+# Задержка перед повтором, секунды; удваивается с каждой попыткой
+TASKS_RETRY_DELAY = 10
+# Задача дольше этого времени считается брошенной воркером
+TASKS_LOCK_TIMEOUT = 10 * 60
+TASKS_POLL_INTERVAL = 1
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -99,12 +196,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Соединение переиспользуется потоком столько секунд (0 — на каждый запрос,
+# None — без ограничения); перед запросом оно проверяется (core.connections)
+DB_CONN_MAX_AGE = int(os.getenv('YATUBE_DB_CONN_MAX_AGE', 60))
+DB_CONN_HEALTH_CHECKS = True
+# Запросы, открывшие больше соединений, попадают в лог
+DB_MAX_CONNECTIONS_PER_REQUEST = 1
+# Счётчики статистики (core.cache.BufferedCounters) копятся в процессе
+# и пишутся в кэш не чаще раза в столько секунд
+STATS_FLUSH_INTERVAL = 5
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+    }
+}
+
+# Реплики только для чтения: YATUBE_DB_REPLICAS=/path/a.sqlite3,/path/b.sqlite3.
+# Локально это копии основной базы (manage.py sync_replicas), в тестах
+# они зеркалят default
+DATABASE_REPLICAS = []
+for number, name in enumerate(
+    filter(None, os.getenv('YATUBE_DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{number}')
+# Применяются к каждому соединению SQLite (core.signals)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    # В режиме WAL normal не теряет целостность, только последние коммиты
+    # при отключении питания
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
+    'temp_store': 'memory',
+    # Ограничивает работу ANALYZE внутри PRAGMA optimize
+    'analysis_limit': 400,
 }
+SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+# Сколько секунд после записи клиент читает из основной базы
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'primary_pin'
 
 
 # Password validation
@@ -1,9 +1,17 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from core.views import metrics_view, profiling_report
+
 urlpatterns = [
+    # Сводка профилирования для администраторов
+    path('admin/profiling/', profiling_report, name='profiling'),
+    # Метрики для Prometheus
+    path('metrics', metrics_view, name='metrics'),
     # Админка
     path('admin/', admin.site.urls),
+    # JSON API лент для мобильных клиентов
+    path('api/', include('posts.api_urls', namespace='api')),
     # Главная страница
     path('', include('posts.urls', namespace='posts')),
     # Страницы авторизации для <<Yatube>>